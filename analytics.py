@@ -0,0 +1,154 @@
+"""
+Rolling statistics and price anomalies for every (CITY, CONTAINER_TYPE, CONTAINER_CONDITION)
+series of the trading index.
+
+Series are contiguous, date-sorted blocks of `TradingIndex.frame`, so trailing windows are
+computed for all series at once from cumulative sums that reset at block starts. When the
+index only had rows appended, just the touched series tails are recomputed.
+"""
+import numpy as np
+import pandas as pd
+
+WINDOW = 8  # observations per trailing window
+MIN_PERIODS = 4
+Z_THRESHOLD = 2.5
+
+STAT_COLUMNS = ["Rolling Mean", "Rolling Std", "Volatility", "Z-Score", "Anomaly"]
+EVENT_WINDOW = pd.Timedelta(days=14)  # prices compared before and after a calendar event
+
+
+def _trailing_sums(values, block_start, window, include_current):
+    """Count, sum and sum of squares of the non-NaN values in each row's trailing window."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    sums = np.concatenate(([0.0], np.cumsum(filled)))
+    squares = np.concatenate(([0.0], np.cumsum(filled * filled)))
+
+    rows = np.arange(len(values))
+    hi = rows + 1 if include_current else rows
+    lo = np.maximum(hi - window, block_start)
+    return counts[hi] - counts[lo], sums[hi] - sums[lo], squares[hi] - squares[lo]
+
+
+def _mean_std(count, total, squares):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        var = np.where(count > 1, (squares - count * mean * mean) / (count - 1), np.nan)
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+def rolling_stats(prices, block_start, window=WINDOW, min_periods=MIN_PERIODS, z_threshold=Z_THRESHOLD):
+    """
+    Trailing statistics for rows grouped in contiguous blocks.
+    `block_start[i]` is the first row of the block row i belongs to.
+    """
+    prices = np.asarray(prices, dtype=float)
+    rows = np.arange(len(prices))
+
+    mean, std = _mean_std(*_trailing_sums(prices, block_start, window, include_current=True))
+
+    # period-on-period returns, undefined on the first row of a block
+    previous = np.concatenate(([np.nan], prices[:-1]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.where(rows > block_start, prices / previous - 1, np.nan)
+    _, volatility = _mean_std(*_trailing_sums(returns, block_start, window, include_current=True))
+
+    # z-score of each price against the window before it
+    prior_count, prior_sum, prior_squares = _trailing_sums(prices, block_start, window, include_current=False)
+    prior_mean, prior_std = _mean_std(prior_count, prior_sum, prior_squares)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z_score = np.where((prior_count >= min_periods) & (prior_std > 0), (prices - prior_mean) / prior_std, np.nan)
+
+    return pd.DataFrame({"Rolling Mean": mean, "Rolling Std": std, "Volatility": volatility,
+                         "Z-Score": z_score, "Anomaly": np.abs(np.nan_to_num(z_score)) >= z_threshold})
+
+
+class RollingStats:
+    """Rolling statistics aligned row for row with a TradingIndex frame."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.version = None
+        self.frame = pd.DataFrame(columns=STAT_COLUMNS)
+
+    def update(self, trading_index):
+        if self.version == trading_index.version:
+            return self
+        changes = trading_index.changes
+        if changes is not None and changes["base_version"] == self.version:
+            self._update_tail(trading_index, changes)
+        else:
+            block_start = np.repeat(trading_index.starts, trading_index.stops - trading_index.starts)
+            self.frame = rolling_stats(trading_index.frame["MARKET_PRICE_USD"].to_numpy(dtype=float),
+                                       block_start, self.window)
+        self.version = trading_index.version
+        return self
+
+    def _update_tail(self, trading_index, changes):
+        # carry the old rows over to their new positions
+        order, n_old = changes["order"], changes["n_old"]
+        carried = order < n_old
+        values = {col: np.full(len(order), np.nan) for col in STAT_COLUMNS}
+        for col in STAT_COLUMNS:
+            values[col][carried] = self.frame[col].to_numpy(dtype=float)[order[carried]]
+
+        # recompute each touched series from its first new row, with one window of context
+        prices = trading_index.frame["MARKET_PRICE_USD"].to_numpy(dtype=float)
+        starts = trading_index.starts[changes["dirty_blocks"]]
+        stops = trading_index.stops[changes["dirty_blocks"]]
+        context = np.maximum(changes["dirty_from"] - self.window, starts)
+        lengths = stops - context
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        rows = np.arange(lengths.sum()) + np.repeat(context - offsets, lengths)
+
+        tail = rolling_stats(prices[rows], np.repeat(offsets, lengths), self.window)
+        keep = rows >= np.repeat(changes["dirty_from"], lengths)
+        for col in STAT_COLUMNS:
+            values[col][rows[keep]] = tail[col].to_numpy(dtype=float)[keep]
+
+        values["Anomaly"] = values["Anomaly"].astype(bool)
+        self.frame = pd.DataFrame(values)
+
+
+def price_alerts(trading_index, stats, positions, limit=10):
+    """Most recent anomalies among the given index rows, newest first."""
+    flagged = positions[stats.frame["Anomaly"].to_numpy()[positions]]
+    alerts = trading_index.frame.iloc[flagged][["DATE", "CITY", "CONTAINER_TYPE", "CONTAINER_CONDITION",
+                                                "MARKET_PRICE_USD"]]
+    alerts = alerts.join(stats.frame.iloc[flagged][["Rolling Mean", "Z-Score"]])
+    return alerts.sort_values("DATE", ascending=False).head(limit)
+
+
+def event_price_moves(trading_index, dates, window=EVENT_WINDOW, city=None):
+    """
+    % change of container prices around each date: for every series (of `city`, or all),
+    the mean price over the `window` from the date against the `window` before it,
+    averaged over the series with prices on both sides. NaN for undated events or when no
+    series has prices on both sides.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[ns]")
+    prices = trading_index.frame["MARKET_PRICE_USD"].to_numpy(dtype=float)
+    valid = ~np.isnan(prices)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, prices, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    blocks = np.arange(len(trading_index.starts))
+    if city is not None:
+        blocks = blocks[trading_index.groups.get_level_values("CITY") == city]
+    dated = ~np.isnat(dates)
+    bounds = np.stack([dates - window, dates, dates + window]).view(np.int64)
+
+    total, series = np.zeros(len(dates)), np.zeros(len(dates), dtype=int)
+    for lo, hi in zip(trading_index.starts[blocks], trading_index.stops[blocks]):
+        # one binary search per series for all dates, then window sums from the prefix sums
+        start, middle, end = lo + np.searchsorted(trading_index.dates[lo:hi], bounds, side="left")
+        before, after = counts[middle] - counts[start], counts[end] - counts[middle]
+        both = dated & (before > 0) & (after > 0)
+        mean_before = (sums[middle] - sums[start])[both] / before[both]
+        mean_after = (sums[end] - sums[middle])[both] / after[both]
+        total[both] += (mean_after / mean_before - 1) * 100
+        series[both] += 1
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(series > 0, total / series, np.nan)
@@ -0,0 +1,114 @@
+"""
+Search index over the geopolitical calendar.
+
+The calendar is tokenized once per fetch into an inverted index (word -> row positions)
+with a sorted vocabulary, so a query is a few lookups and binary searches instead of a
+substring scan of every event on each keystroke. Every query word matches the indexed
+words it is a prefix of, so results follow the user as they type; all query words must
+match. Results are ranked by how many query words matched a whole word, then by date.
+
+Locations and dates are indexed too (location -> rows, dates sorted once), so the archive
+can be cut to a date range and a set of locations without scanning it.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# rows shown per results page
+PAGE_SIZE = 25
+
+_WORD = re.compile(r"\w+")
+
+_lock = threading.Lock()
+_memory = {"key": None, "index": None}
+
+
+def tokenize(text):
+    """Lower-case words of `text` with accents folded, so "Sao" finds "São"."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return _WORD.findall("".join(char for char in text if not unicodedata.combining(char)))
+
+
+class EventIndex:
+    """Inverted index over the Event and Location text of a calendar frame."""
+
+    def __init__(self, calendar: pd.DataFrame):
+        self.calendar = calendar
+        postings = {}
+        texts = calendar["Event"].fillna("") + " " + calendar["Location"].fillna("")
+        for row, text in enumerate(texts):
+            for word in set(tokenize(text)):
+                postings.setdefault(word, []).append(row)
+        self.postings = {word: np.array(rows) for word, rows in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        # chronological, undated events last
+        self.by_date = np.argsort(calendar["Date"].fillna(pd.Timestamp.max).to_numpy(), kind="stable")
+        self.sorted_dates = calendar["Date"].fillna(pd.Timestamp.max).to_numpy()[self.by_date]
+        locations = calendar["Location"].fillna("")
+        self.locations = locations.groupby(locations, sort=False).indices
+
+    def rows_between(self, start=None, end=None):
+        """Mask of the events dated within [start, end]; undated events are never in a range."""
+        undated = np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp.max), side="left")
+        lo = 0 if start is None else np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = undated if end is None else min(undated, np.searchsorted(self.sorted_dates,
+                                                                       np.datetime64(pd.Timestamp(end)), side="right"))
+        mask = np.zeros(len(self.calendar), dtype=bool)
+        mask[self.by_date[lo:hi]] = True
+        return mask
+
+    def rows_at(self, locations):
+        """Mask of the events at any of `locations`."""
+        mask = np.zeros(len(self.calendar), dtype=bool)
+        for location in locations:
+            mask[self.locations.get(location, [])] = True
+        return mask
+
+    def _prefixed(self, prefix):
+        """Indexed words starting with `prefix`."""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff", start)
+        return self.vocabulary[start:end]
+
+    def search(self, query, rows=None):
+        """
+        Row positions matching every word of `query`, best first; all rows by date for an
+        empty query. `rows` (a boolean mask) restricts the candidates, e.g. to some locations.
+        """
+        words = tokenize(query)
+        order = self.by_date if rows is None else self.by_date[rows[self.by_date]]
+        if not words:
+            return order
+
+        matched, exact_hits = None, np.zeros(len(self.calendar), dtype=int)
+        for word in words:
+            prefixed = self._prefixed(word)
+            if not prefixed:
+                return order[:0]
+            hits = np.unique(np.concatenate([self.postings[w] for w in prefixed]))
+            matched = hits if matched is None else np.intersect1d(matched, hits, assume_unique=True)
+            if word in self.postings:
+                exact_hits[self.postings[word]] += 1
+
+        candidates = np.zeros(len(self.calendar), dtype=bool)
+        candidates[matched] = True
+        order = order[candidates[order]]
+        # stable, so ties keep the date order
+        return order[np.argsort(-exact_hits[order], kind="stable")]
+
+
+def calendar_index(calendar, key):
+    """The EventIndex of `calendar`, built once per `key` (its fetch time) and shared by sessions."""
+    with _lock:
+        if _memory["key"] != key or _memory["index"] is None:
+            _memory["index"], _memory["key"] = EventIndex(calendar), key
+        return _memory["index"]
+
+
+def results_page(index, order, page, page_size=PAGE_SIZE):
+    """Calendar rows of one 1-based results page."""
+    return index.calendar.iloc[order[(page - 1) * page_size:page * page_size]]
@@ -0,0 +1,126 @@
+"""
+Change detection for the worksheets, without downloading them.
+
+One poller thread per process fingerprints the worksheets from cheap metadata: the
+spreadsheet's Drive modified time for service-account connections. Public sheets have no
+metadata endpoint, and fingerprinting them would mean downloading every worksheet on each
+poll, so they aren't polled and only refresh with the GSheets read cache. Only when a
+fingerprint moves are the worksheets behind it reread, and only a reread that changed a
+data version is announced. Sessions watch for that from `change_listener`, a fragment
+that reruns the app onto the new version.
+
+The Drive call goes through a private method of the streamlit_gsheets client (pinned in
+requirements.txt); if a release drops it the feed logs it once and stops polling.
+"""
+import logging
+import os
+import threading
+
+import streamlit as st
+
+# seconds between polls; CHANGE_FEED_INTERVAL=0 turns the feed off
+POLL_INTERVAL = int(os.environ.get("CHANGE_FEED_INTERVAL", "60"))
+# how often an open session checks the process for a new data version
+LISTEN_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+def sheet_signatures(conn, worksheets, handles):
+    """
+    {worksheet: fingerprint} for the given worksheets of one connection. `handles` keeps
+    opened spreadsheets between polls. A connection without Drive metadata (public sheets)
+    gets None fingerprints, which never move.
+    """
+    if hasattr(conn, "sheet_signature"):
+        # stand-in connections (tests, local fixtures) fingerprint themselves
+        return {worksheet: conn.sheet_signature(worksheet) for worksheet in worksheets}
+
+    client = getattr(conn, "client", None)
+    open_spreadsheet = getattr(client, "_open_spreadsheet", None)
+    if open_spreadsheet is None or handles.get(id(conn)) is False:
+        return dict.fromkeys(worksheets)
+    try:
+        # service account: one Drive metadata call covers every worksheet of the spreadsheet
+        if id(conn) not in handles:
+            handles[id(conn)] = open_spreadsheet()
+        modified = handles[id(conn)].get_lastUpdateTime()
+    except (AttributeError, TypeError):
+        # the private client API moved; polling it again would fail the same way
+        logger.warning("streamlit_gsheets client has no usable _open_spreadsheet, not polling it", exc_info=True)
+        handles[id(conn)] = False
+        return dict.fromkeys(worksheets)
+    return dict.fromkeys(worksheets, modified)
+
+
+class ChangeFeed:
+    """
+    Polls the worksheets behind `sources`, {frame name: (connection key, worksheet)}.
+    `connect(key)` opens a connection, so the poller thread opens them itself, and the
+    worksheets sharing a key are fingerprinted in one call. `reread(names)` reloads the
+    named frames and returns the ones whose data version changed; each such reread bumps
+    `sequence`.
+    """
+
+    def __init__(self, sources, connect, reread, interval=POLL_INTERVAL):
+        self.sources = sources
+        self.connect = connect
+        self.reread = reread
+        self.interval = interval
+        self.sequence = 0
+        self.signatures = {}
+        self._handles = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def poll(self):
+        """Frames whose worksheet fingerprint moved since the last poll; the first poll only records them."""
+        by_connection = {}
+        for name, (key, worksheet) in self.sources.items():
+            by_connection.setdefault(key, []).append((name, worksheet))
+
+        moved = []
+        for key, items in by_connection.items():
+            signatures = sheet_signatures(self.connect(key), [worksheet for _, worksheet in items], self._handles)
+            for name, worksheet in items:
+                if name in self.signatures and signatures[worksheet] != self.signatures[name]:
+                    moved.append(name)
+                self.signatures[name] = signatures[worksheet]
+        return moved
+
+    def check(self):
+        """Poll once and reread what moved; returns the frames whose data version changed."""
+        moved = self.poll()
+        changed = self.reread(moved) if moved else []
+        if changed:
+            self.sequence += 1
+        return changed
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                # a failed poll (quota, network) is retried on the next interval
+                logger.warning("change feed poll failed", exc_info=True)
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+@st.fragment(run_every=LISTEN_INTERVAL)
+def change_listener(dataset):
+    """Invisible fragment that reruns the app once the dataset's data version moved."""
+    sequence = dataset.change_sequence()
+    seen = st.session_state.setdefault("change_sequence", sequence)
+    if sequence != seen:
+        st.session_state["change_sequence"] = sequence
+        dataset.reconcile()
+        st.rerun()
@@ -1,5 +1,11 @@
+import os
 from enum import Enum
 
+# local on-disk stores (scrape histories, caches), kept out of git
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+# DASHBOARD_DEBUG=1 adds a Diagnostics expander to the sidebar (payload sizes and the like)
+DEBUG_PANEL = os.environ.get("DASHBOARD_DEBUG", "0") == "1"
+
 
 class Commodities(Enum):
     ENERGY = {
@@ -0,0 +1,316 @@
+"""
+Shared data service for multi-process deployments.
+
+One service process per host owns a Dataset: it reads the worksheets, preprocesses them
+and computes the heavy aggregates once per data version. Any number of Streamlit worker
+processes (started with DATA_SERVICE_ADDRESS set) fetch frames and aggregates from it over
+a local socket and keep the latest version of each in memory, so a value crosses the
+socket once per worker and version.
+
+    python data_service.py                 # serve on DATA_SERVICE_ADDRESS
+    DATA_SERVICE_ADDRESS=127.0.0.1:50110 streamlit run app.py --server.port 8501
+
+Worksheet frames are not sent over the socket: the service publishes each version to the
+frame store and workers memory-map it (see frame_store.py).
+"""
+import os
+import secrets
+import threading
+from multiprocessing.managers import BaseManager
+
+import pandas as pd
+
+from const import CACHE_DIR
+from frame_store import publish, open_frame
+
+DEFAULT_ADDRESS = "127.0.0.1:50110"
+# shared secret for the socket, created by the service and read by the workers
+AUTHKEY_PATH = os.path.join(CACHE_DIR, "data_service.key")
+# DATA_SERVICE_FRAME_STORE=0 pickles frames over the socket instead of memory-mapping them
+USE_FRAME_STORE = os.environ.get("DATA_SERVICE_FRAME_STORE", "1") == "1"
+
+# what the service hands out, and the Dataset frame each one is versioned by
+FRAMES = {"locations_map": "locations_map", "inventory": "inventory", "weekly_pricing": "weekly_pricing",
+          "trading": "trading"}
+AGGREGATES = {"trading_stats": "trading", "trading_forecasts": "trading", "turnover": "inventory",
+              "economics": "inventory"}
+
+
+def parse_address(address):
+    """'host:port' for TCP, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("/"):
+        return host, int(port)
+    return address
+
+
+def load_authkey(create=False):
+    if os.environ.get("DATA_SERVICE_AUTHKEY"):
+        return os.environ["DATA_SERVICE_AUTHKEY"].encode()
+    if create and not os.path.exists(AUTHKEY_PATH):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd = os.open(AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(AUTHKEY_PATH) as f:
+        return f.read().strip().encode()
+
+
+class DataService:
+    """Server side: a Dataset behind a lock, handing out (version, value) pairs."""
+
+    def __init__(self, dataset=None):
+        from dataset import Dataset
+
+        self.dataset = dataset or Dataset()
+        self._lock = threading.RLock()
+        # one per aggregate, so different aggregates are computed concurrently
+        self._item_locks = {}
+
+    def get(self, name, known_version=None, *args):
+        """
+        Current version of `name` and its value, or None for the value when the caller
+        already holds that version.
+        """
+        return self.get_many([((name,) + args, known_version)])[0]
+
+    def get_many(self, items):
+        """
+        (version, value) for each ((name, *args), known version) item, like `get`, all from
+        the same version of the worksheets. Frames are handed out under the dataset lock;
+        aggregates are computed outside it, then checked to still match their frame.
+        """
+        for (name, *_), _ in items:
+            if name not in FRAMES and name not in AGGREGATES:
+                raise KeyError(f"unknown data service item {name!r}")
+        while True:
+            with self._lock:
+                self.dataset.reconcile()
+                bases = {FRAMES.get(name) or AGGREGATES[name] for (name, *_), _ in items}
+                versions = {base: self.dataset.version(base) for base in bases}
+                replies, computed = [], []
+                for (name, *args), known_version in items:
+                    if name in FRAMES:
+                        version = versions[FRAMES[name]]
+                        replies.append((version, None if version == known_version else self._frame(name, version)))
+                    else:
+                        version = (versions[AGGREGATES[name]],) + tuple(args)
+                        replies.append((version, None))
+                        if version != known_version:
+                            computed.append((len(replies) - 1, name, args))
+                item_locks = [self._item_locks.setdefault(name, threading.Lock()) for _, name, _ in computed]
+
+            for (i, name, args), item_lock in zip(computed, item_locks):
+                with item_lock:
+                    replies[i] = (replies[i][0], getattr(self.dataset, name)(*args))
+
+            with self._lock:
+                self.dataset.reconcile()
+                if all(self.dataset.version(base) == version for base, version in versions.items()):
+                    return replies
+            # a frame moved while the aggregates were computed, serve the new version instead
+
+    def _frame(self, name, version):
+        value = getattr(self.dataset, name)()
+        if not USE_FRAME_STORE:
+            return value
+        from trading_index import TradingIndex
+
+        frame = value.frame if isinstance(value, TradingIndex) else value
+        path = publish(name, version, frame) if isinstance(frame, pd.DataFrame) else None
+        if path is None:
+            return value
+        return {"path": path, "trading": isinstance(value, TradingIndex)}
+
+    def version(self, name):
+        with self._lock:
+            return self.dataset.version(FRAMES[name])
+
+    def versions(self, names):
+        with self._lock:
+            self.dataset.reconcile()
+            return {name: self.dataset.version(FRAMES[name]) for name in names}
+
+    def change_sequence(self):
+        return self.dataset.change_sequence()
+
+    def is_loaded(self, name):
+        with self._lock:
+            return self.dataset.is_loaded(name)
+
+    def refresh(self, *names):
+        with self._lock:
+            self.dataset.refresh(*names)
+
+
+class DataServiceManager(BaseManager):
+    pass
+
+
+_service = {}
+
+
+def _get_service():
+    if "service" not in _service:
+        _service["service"] = DataService()
+    return _service["service"]
+
+
+DataServiceManager.register("service", callable=_get_service)
+
+# worker side: one connection and the latest (version, value) per item, shared by the worker's sessions
+_worker = {"proxy": None, "values": {}}
+_worker_lock = threading.Lock()
+# values kept per aggregate with arguments, e.g. turnover for the last few as-of dates
+MAX_VALUES_PER_ITEM = 4
+
+
+def connect(address=None):
+    with _worker_lock:
+        if _worker["proxy"] is None:
+            address = parse_address(address or os.environ.get("DATA_SERVICE_ADDRESS", DEFAULT_ADDRESS))
+            manager = DataServiceManager(address=address, authkey=load_authkey())
+            manager.connect()
+            _worker["proxy"] = manager.service()
+        return _worker["proxy"]
+
+
+class RemoteDataset:
+    """
+    Worker side: the Dataset interface over the data service.
+    Like Dataset, each session keeps the values it has read until it refreshes them.
+    """
+
+    def __init__(self, service=None):
+        self._service = service
+        self._frames = {}
+        self._versions = {}
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = connect()
+        return self._service
+
+    def _get(self, name, *args):
+        key = (name,) + args
+        if key not in self._frames:
+            # an aggregate comes with the frame it was computed from, in one round trip, so a
+            # session never pairs e.g. the rolling stats with another version of the trading index
+            self._fetch([key] if name in FRAMES else [(AGGREGATES[name],), key])
+        return self._frames[key]
+
+    def _fetch(self, keys):
+        with _worker_lock:
+            known = [_worker["values"].get(key, (None, None)) for key in keys]
+        replies = self.service.get_many([(key, version) for key, (version, _) in zip(keys, known)])
+        values = []
+        for (_, known_value), (version, value) in zip(known, replies):
+            try:
+                values.append((version, known_value if value is None else _open_published(value)))
+            except FileNotFoundError:
+                # superseded by a newer version between the reply and the read
+                return self._fetch(keys)
+        for key, (_, known_value), (version, value) in zip(keys, known, values):
+            if value is not known_value:
+                with _worker_lock:
+                    _keep(key, version, value)
+            self._frames[key] = value
+            self._versions[key[0]] = version
+
+    def locations_map(self):
+        return self._get("locations_map")
+
+    def inventory(self):
+        return self._get("inventory")
+
+    def weekly_pricing(self):
+        return self._get("weekly_pricing")
+
+    def trading(self):
+        return self._get("trading")
+
+    def trading_stats(self):
+        return self._get("trading_stats")
+
+    def trading_forecasts(self):
+        return self._get("trading_forecasts")
+
+    def turnover(self, as_of):
+        return self._get("turnover", as_of)
+
+    def economics(self):
+        return self._get("economics")
+
+    def version(self, name):
+        if name not in self._versions:
+            self._get(name)
+        return self._versions[name]
+
+    def is_loaded(self, name):
+        return (name,) in self._frames
+
+    def change_sequence(self):
+        return self.service.change_sequence()
+
+    def reconcile(self):
+        """Drop values whose frame has a newer version on the service, so the next access fetches it."""
+        loaded = sorted({key[0] for key in self._frames if key[0] in FRAMES})
+        if not loaded:
+            return
+        versions = self.service.versions(loaded)
+        self._drop({name for name in loaded if versions[name] != self._versions.get(name)})
+
+    def refresh(self, *names):
+        self.service.refresh(*names)
+        # derived aggregates follow the frames they were computed from
+        names = set(names or FRAMES)
+        if "locations_map" in names:
+            names.add("weekly_pricing")
+        self._drop(names)
+
+    def _drop(self, names):
+        for key in list(self._frames):
+            if key[0] in names or AGGREGATES.get(key[0]) in names:
+                self._frames.pop(key)
+                self._versions.pop(key[0], None)
+
+
+def _keep(key, version, value):
+    """
+    Store the worker's (version, value) of `key`, dropping the values of the same item built
+    from an older version of its frame, and all but the latest few argument variants.
+    """
+    values = _worker["values"]
+    base = version[0] if key[0] in AGGREGATES else version
+    for other in [other for other in values if other[0] == key[0] and other != key]:
+        other_version = values[other][0]
+        if (other_version[0] if key[0] in AGGREGATES else other_version) != base:
+            values.pop(other)
+    values.pop(key, None)
+    values[key] = (version, value)
+    variants = [other for other in values if other[0] == key[0]]
+    for other in variants[:-MAX_VALUES_PER_ITEM]:
+        values.pop(other)
+
+
+def _open_published(value):
+    if not (isinstance(value, dict) and "path" in value):
+        return value
+    frame = open_frame(value["path"])
+    if value["trading"]:
+        from trading_index import TradingIndex
+        return TradingIndex.from_sorted(frame)
+    return frame
+
+
+def serve(address=None):
+    address = parse_address(address or os.environ.get("DATA_SERVICE_ADDRESS", DEFAULT_ADDRESS))
+    manager = DataServiceManager(address=address, authkey=load_authkey(create=True))
+    server = manager.get_server()
+    print(f"Data service listening on {server.address}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
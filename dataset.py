@@ -0,0 +1,252 @@
+import copy
+import os
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from analytics import RollingStats
+from change_feed import ChangeFeed, POLL_INTERVAL
+from economics import inventory_economics
+from forecasting import PriceForecasts
+from frame_store import share, share_first, shared, save_snapshot, load_snapshot
+from trading_index import TradingIndex
+from turnover import inventory_turnover
+from utils import load_inventory, load_locations_map, load_weekly_pricing, load_trading_prices, data_version, \
+    READ_TTL
+
+
+# worksheet frames, treated as immutable, so sessions on the same data version share one copy
+SHARED_FRAMES = ["locations_map", "inventory", "weekly_pricing", "trading"]
+# connection and worksheet behind each of them, for the change feed
+WORKSHEETS = {"locations_map": ("conn", "Settings"), "inventory": ("conn", "Data_Sheet"),
+              "weekly_pricing": ("conn", "Market pricing"), "trading": ("conn_pricing", "Trading market price")}
+# matches the GSheets read cache, which would hand a new session the same rows anyway
+SHARED_MAX_AGE = 3600
+# DATASET_SNAPSHOT=0 always reads the sheets on start instead of mapping the last snapshot
+USE_SNAPSHOT = os.environ.get("DATASET_SNAPSHOT", "1") == "1"
+
+# background reread of the sheets after a start served from the snapshot, once per process
+_refresh = {"thread": None, "done": threading.Event()}
+_refresh_lock = threading.Lock()
+# the process's change feed, started once a session reads the sheets
+_feed = {"feed": None}
+
+
+class Dataset:
+    """
+    Worksheets read on first use.
+
+    Tabs ask for the frames they show, so Calendar and News never touch the sheets.
+    Loaded frames are memoized for the other tabs of the session, and shared with the
+    other sessions of the process that loaded the same version. Right after a start they
+    are mapped from the last snapshot while the sheets are reread in the background.
+    A session follows newer versions other sessions or the change feed registered.
+    """
+
+    def __init__(self, conn=None, conn_pricing=None, read_ttl=READ_TTL):
+        self._conn = conn
+        self._conn_pricing = conn_pricing
+        self.read_ttl = read_ttl
+        self._frames = {}
+        self._versions = {}
+        self._reload = set()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = gsheets_connection("gsheets")
+        return self._conn
+
+    @property
+    def conn_pricing(self):
+        if self._conn_pricing is None:
+            self._conn_pricing = gsheets_connection("pricing_data")
+        return self._conn_pricing
+
+    def _get(self, name, loader):
+        if name not in self._frames:
+            known = None
+            if name in SHARED_FRAMES and name not in self._reload:
+                # another session of this process loaded it recently, or the last run left a snapshot
+                known = shared(name, SHARED_MAX_AGE) or self._from_snapshot(name)
+            if known is not None:
+                self._versions[name], value = known
+            else:
+                value = loader()
+                if name in SHARED_FRAMES:
+                    self._versions[name] = content_version(value)
+                    value = share(name, self._versions[name], value)
+                    if USE_SNAPSHOT:
+                        save_snapshot(name, self._versions[name],
+                                      value.frame if isinstance(value, TradingIndex) else value)
+            if name in SHARED_FRAMES:
+                start_change_feed(self._conn, self._conn_pricing)
+            self._reload.discard(name)
+            self._frames[name] = value
+        return self._frames[name]
+
+    def _from_snapshot(self, name):
+        """Snapshot (version, value) of a worksheet while this process hasn't reread the sheets yet."""
+        if not USE_SNAPSHOT or _refresh["done"].is_set():
+            return None
+        known = load_snapshot(name)
+        if known is None:
+            return None
+        version, value = known
+        if name == "trading":
+            value = TradingIndex.from_sorted(value)
+        start_background_refresh(self._conn, self._conn_pricing)
+        # the background reread may have registered a newer version meanwhile
+        return share_first(name, version, value)
+
+    def locations_map(self):
+        return self._get("locations_map", lambda: load_locations_map(self.conn, self.read_ttl))
+
+    def inventory(self):
+        return self._get("inventory", lambda: load_inventory(self.conn, self.read_ttl))
+
+    def weekly_pricing(self):
+        return self._get("weekly_pricing",
+                         lambda: load_weekly_pricing(self.conn, self.locations_map(), self.read_ttl))
+
+    def trading(self):
+        return self._get("trading", lambda: TradingIndex(load_trading_prices(self.conn_pricing, self.read_ttl)))
+
+    def trading_stats(self):
+        """Rolling price statistics, brought up to date with the trading index incrementally."""
+        stats = self._get("trading_stats", RollingStats)
+        return stats.update(self.trading())
+
+    def trading_forecasts(self):
+        """Forecast parameters per trading series, refit only for the series that changed."""
+        forecasts = self._get("trading_forecasts", PriceForecasts)
+        return forecasts.update(self.trading())
+
+    def turnover(self, as_of):
+        """Turnover counters per (Location, Depot, Size, Condition), cached per inventory version."""
+        return inventory_turnover(self.inventory(), self.version("inventory"), as_of)
+
+    def economics(self):
+        """Unit-economics counters per (Location, Depot, Customer, Size, sale month)."""
+        return inventory_economics(self.inventory(), self.version("inventory"))
+
+    def version(self, name):
+        """Content hash of a loaded frame, for keying derived caches."""
+        if name not in self._versions:
+            self._versions[name] = content_version(getattr(self, name)())
+        return self._versions[name]
+
+    def is_loaded(self, name):
+        return name in self._frames
+
+    def reconcile(self):
+        """
+        Drop loaded frames the process has a newer version of (a background reread, the change
+        feed or another session's refresh), so this run reads that one; called at the top of each run.
+        """
+        for name in SHARED_FRAMES:
+            known = shared(name, float("inf")) if name in self._frames else None
+            if known is not None and known[0] != self._versions.get(name):
+                self._frames.pop(name)
+                self._versions.pop(name, None)
+
+    def change_sequence(self):
+        """Bumped by the change feed whenever it registered a new data version."""
+        return _feed["feed"].sequence if _feed["feed"] is not None else 0
+
+    def refresh(self, *names):
+        """
+        Forget the named worksheets (all of them by default) so the next access rereads them.
+        The trading index is refreshed incrementally so appended dates are spliced in.
+        """
+        for name in names or list(self._frames):
+            self._versions.pop(name, None)
+            if name == "trading" and name in self._frames:
+                # the loaded index may be shared with other sessions, refresh a copy of it
+                index = copy.copy(self._frames[name]).refresh(load_trading_prices(self.conn_pricing, self.read_ttl))
+                self._versions[name] = content_version(index)
+                self._frames[name] = share(name, self._versions[name], index)
+                if USE_SNAPSHOT:
+                    save_snapshot(name, self._versions[name], index.frame)
+            else:
+                self._frames.pop(name, None)
+                self._reload.add(name)
+                if name == "locations_map":
+                    self._frames.pop("weekly_pricing", None)
+                    self._versions.pop("weekly_pricing", None)
+                    self._reload.add("weekly_pricing")
+
+
+def reread(conn=None, conn_pricing=None, names=SHARED_FRAMES):
+    """
+    Read the named worksheets past the GSheets read cache and register each one whose content
+    changed; the shared trading index is refreshed incrementally. Returns the changed names.
+    """
+    dataset = Dataset(conn, conn_pricing, read_ttl=0)
+    before = {name: (shared(name, float("inf")) or (None,))[0] for name in SHARED_FRAMES}
+    if "trading" in names and before["trading"] is not None:
+        dataset._versions["trading"], dataset._frames["trading"] = shared("trading", float("inf"))
+    dataset.refresh(*names)
+    for name in SHARED_FRAMES:
+        if name in names or (name == "weekly_pricing" and "locations_map" in names):
+            getattr(dataset, name)()
+    return [name for name in SHARED_FRAMES if dataset.is_loaded(name) and dataset.version(name) != before[name]]
+
+
+def start_background_refresh(conn=None, conn_pricing=None):
+    """Reread every snapshot worksheet in a daemon thread; each changed one replaces the shared version."""
+    def run():
+        try:
+            reread(conn, conn_pricing)
+        finally:
+            # on failure sessions keep the snapshot, and later loads go to the sheets
+            _refresh["done"].set()
+
+    with _refresh_lock:
+        if _refresh["thread"] is None:
+            _refresh["thread"] = threading.Thread(target=run, name="snapshot-refresh", daemon=True)
+            _refresh["thread"].start()
+
+
+def start_change_feed(conn=None, conn_pricing=None):
+    """Poll the worksheets for changes, once per process (see change_feed.py)."""
+    with _refresh_lock:
+        if _feed["feed"] is not None or POLL_INTERVAL <= 0:
+            return
+        # opened by the poller thread on its first poll when the session hasn't yet
+        connections = Dataset(conn, conn_pricing)
+        _feed["feed"] = ChangeFeed(WORKSHEETS, lambda attr: getattr(connections, attr),
+                                   lambda names: reread(connections.conn, connections.conn_pricing, names))
+        _feed["feed"].start()
+
+
+def content_version(value):
+    if isinstance(value, TradingIndex):
+        value = value.frame
+    elif isinstance(value, dict):
+        value = pd.Series(value, dtype=object).sort_index().reset_index()
+    return data_version(value)
+
+
+def gsheets_connection(name):
+    # gspread and google-auth are only imported once a tab actually reads a sheet
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection(name, type=GSheetsConnection)
+
+
+def get_dataset(conn=None, conn_pricing=None):
+    """
+    The session's dataset. With DATA_SERVICE_ADDRESS set, frames and aggregates come from
+    the shared data service process (see data_service.py) instead of being loaded here.
+    """
+    if "dataset" not in st.session_state:
+        if os.environ.get("DATA_SERVICE_ADDRESS"):
+            from data_service import RemoteDataset
+            st.session_state["dataset"] = RemoteDataset()
+        else:
+            st.session_state["dataset"] = Dataset(conn, conn_pricing)
+    dataset = st.session_state["dataset"]
+    if isinstance(dataset, Dataset):
+        dataset.reconcile()
+    return dataset
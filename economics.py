@@ -0,0 +1,88 @@
+"""
+Unit economics from the Data_Sheet cost and sale columns.
+
+Per-unit cost, margin and ROI are plain column arithmetic. The additive parts are summed
+once per (Location, Depot, Customer, Size, sale month), and every margin view (by customer,
+depot, size or month) is a second sum over that table with the ratios derived last.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils import month_starts
+
+COST_COLUMNS = ["Purchase Cost", "Repair Cost", "Storage Cost"]
+GROUP_COLUMNS = ["Location", "Depot", "Customer", "Size", "Sale Month"]
+GROUP_OPTIONS = {"Customer": "Customer", "Depot": "Depot", "Size": "Size", "Month": "Sale Month"}
+SUM_COLUMNS = ["Units Sold", "Revenue"] + COST_COLUMNS + ["Total Cost", "Margin",
+                                                          "Units Unsold", "Inventory Cost", "Inventory Value"]
+
+
+def unit_economics(inventory: pd.DataFrame):
+    """Per-unit cost breakdown, margin and ROI; sale-side columns are NaN for unsold units."""
+    sold = inventory["Status"].eq("SOLD").fillna(False).to_numpy(bool)
+    costs = inventory[COST_COLUMNS].to_numpy(dtype=float)
+    # repair and storage are often blank, purchase cost is required for a unit cost
+    costs[:, 1:] = np.nan_to_num(costs[:, 1:])
+    total_cost = costs.sum(axis=1)
+    sale_price = np.where(sold, inventory["Sale Price"].to_numpy(dtype=float), np.nan)
+    margin = sale_price - total_cost
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        units = pd.DataFrame({
+            "Total Cost": total_cost,
+            "Margin": margin,
+            "Margin %": margin / sale_price * 100,
+            "ROI %": margin / total_cost * 100,
+            "Unrealized Margin": np.where(sold, np.nan, inventory["Value"].to_numpy(dtype=float) - total_cost),
+        }, index=inventory.index)
+    return units
+
+
+def economics_counters(inventory: pd.DataFrame):
+    """Additive unit-economics columns summed per GROUP_COLUMNS, in one groupby."""
+    units = unit_economics(inventory)
+    sold = inventory["Status"].eq("SOLD").fillna(False).to_numpy(bool)
+    # a sale only counts towards margins when both its price and its cost are known
+    priced = sold & ~np.isnan(units["Margin"].to_numpy())
+    costs = inventory[COST_COLUMNS].fillna(0).to_numpy(dtype=float)
+
+    counters = pd.DataFrame(np.where(priced[:, None], costs, 0.0), columns=COST_COLUMNS, index=inventory.index)
+    counters["Units Sold"] = priced.astype(np.int64)
+    counters["Revenue"] = np.where(priced, inventory["Sale Price"].to_numpy(dtype=float), 0.0)
+    counters["Total Cost"] = np.where(priced, units["Total Cost"].to_numpy(), 0.0)
+    counters["Margin"] = np.where(priced, units["Margin"].to_numpy(), 0.0)
+    counters["Units Unsold"] = (~sold).astype(np.int64)
+    counters["Inventory Cost"] = np.where(sold, 0.0, np.nan_to_num(units["Total Cost"].to_numpy()))
+    counters["Inventory Value"] = np.where(sold, 0.0, inventory["Value"].fillna(0).to_numpy(dtype=float))
+
+    keys = inventory[GROUP_COLUMNS[:-1]].fillna("Unknown")
+    keys["Sale Month"] = np.where(sold, inventory["Gate Out Month"].to_numpy(), -1)
+    return counters[SUM_COLUMNS].groupby([keys[col] for col in GROUP_COLUMNS]).sum().reset_index()
+
+
+@st.cache_data(show_spinner=False)
+def inventory_economics(_inventory, inventory_version):
+    return economics_counters(_inventory)
+
+
+def economics_summary(counters: pd.DataFrame, by=None):
+    """Counters re-summed by the `by` column (all rows when None) with per-unit averages and ratios."""
+    if by is None:
+        totals = counters[SUM_COLUMNS].sum().to_frame().T
+    else:
+        rows = counters if by != "Sale Month" else counters[counters["Sale Month"] >= 0]
+        totals = rows.groupby(by)[SUM_COLUMNS].sum()
+        totals = totals[totals["Units Sold"] > 0] if by == "Sale Month" else totals
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sold_units = totals["Units Sold"].where(totals["Units Sold"] > 0)
+        for col in ["Revenue"] + COST_COLUMNS + ["Margin"]:
+            totals[f"Avg {col}"] = totals[col] / sold_units
+        totals["Margin %"] = totals["Margin"] / totals["Revenue"] * 100
+        totals["ROI %"] = totals["Margin"] / totals["Total Cost"] * 100
+
+    totals = totals.reset_index(drop=by is None)
+    if by == "Sale Month":
+        totals.insert(0, "Month", month_starts(totals["Sale Month"]).dt.strftime("%b %y").to_numpy())
+    return totals
@@ -0,0 +1,298 @@
+"""
+Headless export of the Overview, Sales Analytics and Trading Prices tabs.
+
+Every (page × location × year) combination is rendered with the tabs' own builders,
+either to one static HTML file or to one image per figure (png/svg/pdf, needs kaleido).
+The worksheets and the shared aggregates (turnover and unit-economics counters, rolling
+price stats, forecasts, shipping costs) are computed once in this process and handed to
+a pool of workers, which only filter and draw.
+
+    python export.py --out exports/weekly
+    python export.py --pages sales trading --locations HOU Houston --years 2024 --format png
+"""
+import os
+
+# a one-off run: read the sheets as they are now and don't poll them afterwards
+os.environ.setdefault("DATASET_SNAPSHOT", "0")
+os.environ.setdefault("CHANGE_FEED_INTERVAL", "0")
+# the exports are spread over processes, each builds its figures in turn
+os.environ.setdefault("RENDER_THREADS", "1")
+# a snapshot can't fill map points on a later rerun, wait for the geocoder
+os.environ.setdefault("GEO_WAIT", "1")
+
+import argparse
+import datetime
+import html
+import re
+import time
+
+import pandas as pd
+
+PAGES = ["overview", "sales", "trading"]
+PAGE_TITLES = {"overview": "Overview", "sales": "Sales Analytics", "trading": "Trading Prices"}
+ALL = "All"
+FORMATS = ["html", "png", "svg", "pdf"]
+WORKERS = min(4, os.cpu_count() or 1)
+
+HTML_STYLE = """
+body { font-family: sans-serif; margin: 24px; color: #264653; }
+.kpis { display: flex; flex-wrap: wrap; gap: 12px; margin: 12px 0; }
+.kpi { border: 1px solid #ddd; border-radius: 6px; padding: 8px 14px; }
+.kpi .value { font-size: 1.4em; font-weight: bold; }
+.kpi .delta { color: #2a9d8f; }
+table.data { border-collapse: collapse; font-size: 0.85em; }
+table.data td, table.data th { border: 1px solid #ddd; padding: 3px 8px; }
+"""
+
+
+class FrozenDataset:
+    """The Dataset interface over values computed once by the parent process."""
+
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def freeze(cls, dataset, pages, as_of, shipping_costs):
+        values = {"versions": {}, "shipping_costs": shipping_costs}
+        names = ["weekly_pricing"] if "overview" in pages else []
+        if "sales" in pages:
+            names += ["locations_map", "inventory"]
+            values["turnover"] = dataset.turnover(as_of)
+            values["economics"] = dataset.economics()
+        if "trading" in pages:
+            names += ["trading"]
+            values["trading_stats"] = dataset.trading_stats()
+            values["trading_forecasts"] = dataset.trading_forecasts()
+        for name in names:
+            values[name] = getattr(dataset, name)()
+            values["versions"][name] = dataset.version(name)
+        return cls(values)
+
+    def locations_map(self):
+        return self.values["locations_map"]
+
+    def inventory(self):
+        return self.values["inventory"]
+
+    def weekly_pricing(self):
+        return self.values["weekly_pricing"]
+
+    def trading(self):
+        return self.values["trading"]
+
+    def trading_stats(self):
+        return self.values["trading_stats"]
+
+    def trading_forecasts(self):
+        return self.values["trading_forecasts"]
+
+    def turnover(self, as_of):
+        return self.values["turnover"]
+
+    def economics(self):
+        return self.values["economics"]
+
+    def version(self, name):
+        return self.values["versions"][name]
+
+
+def page_combinations(dataset, pages, locations=None, years=None):
+    """(page, location, year) to render; year is None for the Overview, which has no year filter."""
+    combinations = []
+    for page in pages:
+        if page == "overview":
+            page_locations, page_years = dataset.weekly_pricing()["Location Name"].dropna().unique(), [None]
+        elif page == "sales":
+            inventory = dataset.inventory()
+            page_locations = inventory["Location"].dropna().unique()
+            page_years = sorted(int(year) for year in inventory["Year"].dropna().unique())
+        else:
+            trading_index = dataset.trading()
+            page_locations = trading_index.unique("CITY")
+            page_years = list(range(trading_index.min_date.year, trading_index.max_date.year + 1))
+
+        page_locations = [ALL] + sorted(str(location) for location in page_locations)
+        if locations:
+            page_locations = [location for location in page_locations if location in locations]
+        if years and page != "overview":
+            page_years = [year for year in page_years if year in years]
+        combinations += [(page, location, year) for location in page_locations for year in page_years]
+    return combinations
+
+
+def render_sections(dataset, page, location, year, options):
+    """[(heading, kpis, figures, tables)] for one combination, built with the tabs' builders."""
+    from views import overview_content, sales_content, turnover_content, economics_content, \
+        trading_market_content, trading_city_content, trading_alerts
+    from tables import price_alerts_table
+
+    selection = [] if location == ALL else [location]
+    if page == "overview":
+        kpis, figures = overview_content(dataset.weekly_pricing(), selection)
+        return [("Overview", kpis, figures, {})]
+
+    if page == "sales":
+        empty, kpis, figures = sales_content(dataset, selection, [], year, dataset.values["shipping_costs"])
+        turnover_kpis, aging, turnover_table = turnover_content(dataset, selection, [], options["as_of"])
+        economics_kpis, economics_figures = economics_content(dataset, selection, [], options["group"])
+        return [("Sales" + (" (no records)" if empty else ""), kpis, figures, {}),
+                ("Inventory Turnover", turnover_kpis, {"Aging": aging}, {"Inventory Turnover": turnover_table}),
+                ("Unit Economics", economics_kpis, economics_figures, {})]
+
+    trading_index = dataset.trading()
+    container_type = options["container_type"] or trading_index.unique("CONTAINER_TYPE")[0]
+    condition = options["condition"] or trading_index.unique("CONTAINER_CONDITION")[0]
+    start, end = pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31)
+    heading = f"{container_type} / {condition}"
+    if location == ALL:
+        figures, _ = trading_market_content(trading_index, container_type, condition, start, end)
+    else:
+        figures = trading_city_content(dataset, location, container_type, condition, start, end)
+    alerts = trading_alerts(dataset, container_type, condition, start, end, city=None if location == ALL else location)
+    if len(alerts):
+        figures["Price Alerts"] = price_alerts_table(alerts)
+    return [(heading, [], figures, {})]
+
+
+def _slug(value):
+    return re.sub(r"[^\w.-]+", "_", str(value)).strip("_")
+
+
+def _kpis_html(kpis):
+    cards = "".join(
+        f'<div class="kpi"><div>{html.escape(kpi["label"])}</div><div class="value">{html.escape(str(kpi["value"]))}</div>'
+        + (f'<div class="delta">{html.escape(kpi["delta"])}</div>' if kpi.get("delta") else "") + "</div>"
+        for kpi in kpis)
+    return f'<div class="kpis">{cards}</div>' if kpis else ""
+
+
+def write_html(path, title, sections):
+    parts = [f"<h1>{html.escape(title)}</h1>"]
+    for heading, kpis, figures, tables in sections:
+        parts += [f"<h2>{html.escape(heading)}</h2>", _kpis_html(kpis)]
+        for fig in figures.values():
+            parts.append(fig.to_html(full_html=False, include_plotlyjs=False))
+        for name, table in tables.items():
+            parts += [f"<h3>{html.escape(name)}</h3>",
+                      table.to_html(index=False, classes="data", float_format=lambda x: f"{x:,.1f}", na_rep="—")]
+    with open(path, "w") as f:
+        # plotly.js is written once next to the page directories
+        f.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+                f'<script src="../plotly.min.js"></script><style>{HTML_STYLE}</style></head>'
+                f'<body>{"".join(parts)}</body></html>')
+
+
+def write_images(directory, sections, fmt):
+    """One image per figure, with KPIs and tables next to them as CSV."""
+    os.makedirs(directory, exist_ok=True)
+    kpis = []
+    for heading, section_kpis, figures, tables in sections:
+        kpis += [dict(kpi, section=heading) for kpi in section_kpis]
+        for name, fig in figures.items():
+            fig.write_image(os.path.join(directory, f"{_slug(name)}.{fmt}"))
+        for name, table in tables.items():
+            table.to_csv(os.path.join(directory, f"{_slug(name)}.csv"), index=False)
+    if kpis:
+        pd.DataFrame(kpis).to_csv(os.path.join(directory, "kpis.csv"), index=False)
+
+
+# worker state: the frozen dataset and the run options, set once per worker process
+_worker = {}
+
+
+def _init_worker(dataset, options):
+    _worker["dataset"], _worker["options"] = dataset, options
+
+
+def export_one(page, location, year):
+    """Render one combination into the output directory; returns (path, seconds)."""
+    started = time.perf_counter()
+    options = _worker["options"]
+    sections = render_sections(_worker["dataset"], page, location, year, options)
+
+    name = _slug(location) if year is None else f"{_slug(location)}-{year}"
+    directory = os.path.join(options["out"], page)
+    if options["format"] == "html":
+        path = os.path.join(directory, f"{name}.html")
+        title = f"{PAGE_TITLES[page]} · {location}" + ("" if year is None else f" · {year}")
+        write_html(path, title, sections)
+    else:
+        path = os.path.join(directory, name)
+        write_images(path, sections, options["format"])
+    return path, time.perf_counter() - started
+
+
+def export(dataset, combinations, options, workers=WORKERS):
+    """Render all combinations, across a process pool when there are several workers."""
+    for page in {page for page, _, _ in combinations}:
+        os.makedirs(os.path.join(options["out"], page), exist_ok=True)
+    if options["format"] == "html":
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(options["out"], "plotly.min.js"), "w") as f:
+            f.write(get_plotlyjs())
+
+    if workers < 2 or len(combinations) < 2:
+        _init_worker(dataset, options)
+        return [export_one(*combination) for combination in combinations]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # the frozen dataset goes to each worker once, not with every combination
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset, options)) as pool:
+        return list(pool.map(export_one, *zip(*combinations)))
+
+
+def shipping_costs():
+    """The app's shipping cost table: refetched when stale, the stored one if that fails, else None."""
+    from sources import latest, revalidate
+    from views import shipping_costs_source
+
+    source = shipping_costs_source()
+    future = revalidate(source)
+    if future is not None:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Couldn't refresh the shipping costs ({e}), using the last stored table")
+    return latest(source)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render dashboard tabs to static files.")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument("--locations", nargs="+", help=f"locations or cities to export ('{ALL}' for no filter)")
+    parser.add_argument("--years", nargs="+", type=int)
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    parser.add_argument("--out", default=os.path.join("exports", datetime.date.today().isoformat()))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--container-type", help="Trading Prices container type (default: the tab's default)")
+    parser.add_argument("--condition", help="Trading Prices container condition (default: the tab's default)")
+    parser.add_argument("--group", default="Customer", help="Sales Analytics margin grouping")
+    args = parser.parse_args(argv)
+
+    if args.format != "html":
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error(f"--format {args.format} needs kaleido (pip install kaleido)")
+
+    from dataset import Dataset
+
+    started = time.perf_counter()
+    as_of = datetime.date.today()
+    dataset = FrozenDataset.freeze(Dataset(), args.pages, as_of,
+                                   shipping_costs() if "sales" in args.pages else None)
+    combinations = page_combinations(dataset, args.pages, args.locations, args.years)
+    options = {"out": args.out, "format": args.format, "as_of": as_of, "group": args.group,
+               "container_type": args.container_type, "condition": args.condition}
+    print(f"Loaded data and shared aggregates in {time.perf_counter() - started:.1f}s, "
+          f"rendering {len(combinations)} exports")
+
+    results = export(dataset, combinations, options, args.workers)
+    for path, seconds in results:
+        print(f"{seconds:6.2f}s  {path}")
+    print(f"Done in {time.perf_counter() - started:.1f}s, written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Monthly price forecasts for every (CITY, CONTAINER_TYPE, CONTAINER_CONDITION) series.
+
+All series are laid out as rows of one series × month matrix and fitted together: Holt's
+linear smoothing over a small (alpha, beta) grid and a seasonal-naive model, keeping
+whichever has the lower one-step-ahead error per series. Parameters are kept per series
+version, so a refresh only refits the series whose monthly values changed.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import month_codes
+
+HORIZON = 6  # months
+SEASON = 12
+ALPHAS = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.0, 0.05, 0.1, 0.2])
+BAND_Z = 1.645  # 90% bands
+# batches larger than this are split across a process pool
+POOL_THRESHOLD = 2000
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+HOLT, SEASONAL_NAIVE = 0, 1
+PARAM_COLUMNS = ["model", "alpha", "beta", "level", "trend", "sigma", "gap", "steps"]
+SEASON_COLUMNS = [f"season_{i}" for i in range(SEASON)]
+
+
+def monthly_matrix(trading_index, value="MARKET_PRICE_USD", how="sum"):
+    """
+    One row per index block, one column per month from the first to the last month of the index.
+    Months without observations are NaN. `how` matches the monthly aggregate of `container_prices_plot`.
+    """
+    frame = trading_index.frame
+    months = month_codes(frame["DATE"]).to_numpy()
+    blocks = np.repeat(np.arange(len(trading_index.starts)), trading_index.stops - trading_index.starts)
+    values = frame[value].to_numpy(dtype=float)
+
+    valid = (months >= 0) & ~np.isnan(values)
+    if not valid.any():
+        return np.full((len(trading_index.starts), 0), np.nan), None
+    first_month = int(months[valid].min())
+    n_months = int(months[valid].max()) - first_month + 1
+
+    cells = blocks[valid] * n_months + (months[valid] - first_month)
+    size = len(trading_index.starts) * n_months
+    totals = np.bincount(cells, weights=values[valid], minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    if how == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            totals = totals / counts
+    matrix = np.where(counts > 0, totals, np.nan).reshape(-1, n_months)
+    return matrix, first_month
+
+
+def _fit_holt(matrix):
+    """Holt's linear smoothing for every series and every (alpha, beta) pair of the grid at once."""
+    n_series, n_months = matrix.shape
+    alpha = np.repeat(ALPHAS, len(BETAS))[:, None]
+    beta = np.tile(BETAS, len(ALPHAS))[:, None]
+    shape = (len(alpha), n_series)
+
+    level = np.full(shape, np.nan)
+    trend = np.zeros(shape)
+    sse = np.zeros(shape)
+    steps = np.zeros(n_series, dtype=np.int64)  # observed months with a prediction
+    gap = np.zeros(n_series, dtype=np.int64)  # months since the last observation
+
+    for t in range(n_months):
+        y = matrix[:, t]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level[0])
+        predicted = level + trend
+
+        error = np.where(observed & started, y - predicted, 0.0)
+        sse += error ** 2
+        steps += observed & started
+
+        new_level = alpha * y + (1 - alpha) * predicted
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        # first observation seeds the level, missing months roll the prediction forward
+        level = np.where(observed & started, new_level, np.where(observed, y, np.where(started, predicted, level)))
+        trend = np.where(observed & started, new_trend, trend)
+        gap = np.where(observed, 0, gap + started)
+
+    best = np.argmin(sse, axis=0)
+    series = np.arange(n_series)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(sse[best, series] / np.maximum(steps - 1, 1))
+    return {"alpha": alpha[best, 0], "beta": beta[best, 0], "level": level[best, series],
+            "trend": trend[best, series], "sigma": np.where(steps > 1, sigma, np.nan),
+            "gap": gap, "steps": steps, "mse": sse[best, series] / np.maximum(steps, 1)}
+
+
+def _fit_seasonal_naive(matrix):
+    """Last observed year as the forecast, usable when the last SEASON months are all observed."""
+    n_series, n_months = matrix.shape
+    if n_months < 2 * SEASON:
+        return np.full(n_series, np.inf), np.full(n_series, np.nan), np.full((n_series, SEASON), np.nan)
+
+    errors = matrix[:, SEASON:] - matrix[:, :-SEASON]
+    pairs = (~np.isnan(errors)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sse = np.nansum(errors ** 2, axis=1)
+        mse = np.where(pairs >= SEASON, sse / pairs, np.inf)
+        sigma = np.sqrt(sse / np.maximum(pairs - 1, 1))
+    season = matrix[:, -SEASON:]
+    mse = np.where(np.isnan(season).any(axis=1), np.inf, mse)
+    return mse, sigma, season
+
+
+def fit_batch(matrix):
+    """Fitted parameters for every row of a series × month matrix."""
+    holt = _fit_holt(matrix)
+    seasonal_mse, seasonal_sigma, season = _fit_seasonal_naive(matrix)
+    seasonal = seasonal_mse < holt["mse"]
+
+    params = pd.DataFrame({
+        "model": np.where(seasonal, SEASONAL_NAIVE, HOLT),
+        "alpha": holt["alpha"], "beta": holt["beta"], "level": holt["level"], "trend": holt["trend"],
+        "sigma": np.where(seasonal, seasonal_sigma, holt["sigma"]),
+        "gap": holt["gap"], "steps": holt["steps"],
+    })
+    return pd.concat([params, pd.DataFrame(season, columns=SEASON_COLUMNS)], axis=1)
+
+
+def fit_all(matrix, pool_threshold=POOL_THRESHOLD, workers=POOL_WORKERS):
+    """`fit_batch` over all rows, split across a process pool for large batches."""
+    if len(matrix) <= pool_threshold or workers < 2:
+        return fit_batch(matrix)
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = np.array_split(matrix, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return pd.concat(pool.map(fit_batch, chunks), ignore_index=True)
+
+
+def forecast_values(params: pd.DataFrame, horizon=HORIZON):
+    """Point forecasts and band half-widths, shape (len(params), horizon)."""
+    h = np.arange(1, horizon + 1)
+    alpha, beta = params["alpha"].to_numpy()[:, None], params["beta"].to_numpy()[:, None]
+    sigma = params["sigma"].to_numpy()[:, None]
+    # steps ahead of the last observation
+    ahead = h + params["gap"].to_numpy(dtype=np.int64)[:, None]
+
+    holt_point = params["level"].to_numpy()[:, None] + h * params["trend"].to_numpy()[:, None]
+    # var(h) = sigma² (1 + Σ_{j<h} alpha² (1 + j beta)²)
+    j = np.arange(1, ahead.max(initial=1))
+    terms = (alpha * (1 + j * beta)) ** 2
+    cumulative = np.concatenate((np.zeros((len(params), 1)), np.cumsum(terms, axis=1)), axis=1)
+    holt_spread = sigma * np.sqrt(1 + np.take_along_axis(cumulative, ahead - 1, axis=1))
+
+    season = params[SEASON_COLUMNS].to_numpy(dtype=float)
+    seasonal_point = season[:, (h - 1) % SEASON]
+    seasonal_spread = sigma * np.sqrt((h - 1) // SEASON + 1)
+
+    seasonal = (params["model"].to_numpy(dtype=float) == SEASONAL_NAIVE)[:, None]
+    point = np.where(seasonal, seasonal_point, holt_point)
+    spread = BAND_Z * np.where(seasonal, seasonal_spread, holt_spread)
+    return point, spread
+
+
+class PriceForecasts:
+    """Fitted forecast parameters per trading series, refit only where the series changed."""
+
+    def __init__(self, how="sum"):
+        self.how = how
+        self.version = None
+        self.first_month = None
+        self.n_months = 0
+        self.params = pd.DataFrame(columns=["series_version"] + PARAM_COLUMNS + SEASON_COLUMNS)
+
+    def update(self, trading_index):
+        if self.version == trading_index.version:
+            return self
+        matrix, first_month = monthly_matrix(trading_index, how=self.how)
+        keys = trading_index.groups
+        series_versions = pd.util.hash_pandas_object(pd.DataFrame(matrix), index=False).to_numpy()
+
+        # a shifted month grid changes every row, so versions are only comparable on the same grid
+        params = self.params.reindex(keys)
+        if (first_month, matrix.shape[1]) == (self.first_month, self.n_months):
+            stale = np.flatnonzero(params["series_version"].to_numpy() != series_versions)
+        else:
+            stale = np.arange(len(keys))
+
+        if len(stale):
+            fitted = fit_all(matrix[stale])
+            fitted.insert(0, "series_version", series_versions[stale])
+            fitted.index = keys[stale]
+            if len(stale) < len(keys):
+                fitted = pd.concat([params.drop(index=fitted.index), fitted]).reindex(keys)
+            params = fitted
+
+        self.params = params
+        self.first_month, self.n_months = first_month, matrix.shape[1]
+        self.version = trading_index.version
+        return self
+
+    def forecast(self, city, container_type, condition, horizon=HORIZON):
+        """Forecast months with point forecast and band for one series, empty if it can't be forecast."""
+        key = (city, container_type, condition)
+        if self.first_month is None or key not in self.params.index:
+            return pd.DataFrame(columns=["MONTH_YEAR", "Forecast", "Lower", "Upper"])
+        params = self.params.loc[[key]]
+        if not (params["steps"] > 1).all():
+            return pd.DataFrame(columns=["MONTH_YEAR", "Forecast", "Lower", "Upper"])
+
+        point, spread = forecast_values(params, horizon)
+        last = self.first_month + self.n_months - 1
+        months = pd.PeriodIndex.from_ordinals(last + np.arange(1, horizon + 1) - 1970 * 12, freq="M")
+        return pd.DataFrame({"MONTH_YEAR": months, "Forecast": point[0],
+                             "Lower": point[0] - spread[0], "Upper": point[0] + spread[0]})
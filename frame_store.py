@@ -0,0 +1,148 @@
+"""
+Immutable frames shared between sessions and processes.
+
+Inside a process, sessions that load the same data version get the same frame object
+(`share`). Across processes, the data service publishes each version once as an
+uncompressed Arrow IPC file; workers memory-map it, so its pages live once in the OS page
+cache however many processes read them. Numeric and datetime columns are zero-copy views
+of the mapping. A mapped frame has the dtypes and index of the frame that was published
+(text columns come back as `object`), so it behaves exactly like a fresh load.
+
+The latest published version of each worksheet is also recorded in a snapshot manifest,
+so a restarted process can map the frames it had instead of rereading the sheets.
+"""
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from const import CACHE_DIR
+
+FRAME_STORE = os.path.join(CACHE_DIR, "frames")
+SNAPSHOT_MANIFEST = "snapshot.json"
+# bump when preprocessing changes, so snapshots written by older code are ignored
+SNAPSHOT_FORMAT = 2
+
+_shared = {}
+_lock = threading.Lock()
+
+
+def share(name, version, value):
+    """The process-wide value for (name, version): the first one registered wins."""
+    with _lock:
+        known = _shared.get(name)
+        if known is not None and known[0] == version:
+            return known[1]
+        # only the latest version is kept, sessions still holding an older one keep it alive
+        _shared[name] = (version, value, time.monotonic())
+        return value
+
+
+def share_first(name, version, value):
+    """(version, value) registered for `name`, registering the given ones if there are none."""
+    with _lock:
+        if name not in _shared:
+            _shared[name] = (version, value, time.monotonic())
+        return _shared[name][:2]
+
+
+def shared(name, max_age):
+    """(version, value) registered for `name` less than `max_age` seconds ago, else None."""
+    with _lock:
+        known = _shared.get(name)
+    if known is None or time.monotonic() - known[2] > max_age:
+        return None
+    return known[:2]
+
+
+def frame_path(name, version, store=FRAME_STORE):
+    return os.path.join(store, f"{name}-{version}.arrow")
+
+
+def publish(name, version, frame: pd.DataFrame, store=FRAME_STORE):
+    """
+    Write `frame` for (name, version) unless it is already there, and drop older versions.
+    Returns the file path, or None when a column can't be stored as Arrow (mixed types).
+    """
+    import pyarrow as pa
+
+    path = frame_path(name, version, store)
+    if os.path.exists(path):
+        return path
+    try:
+        # a RangeIndex is kept as metadata only, other indexes as columns
+        table = pa.Table.from_pandas(frame, preserve_index=None)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+    os.makedirs(store, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    # readers that still map an older file keep it until they drop it
+    for file_name in os.listdir(store):
+        if file_name.startswith(f"{name}-") and file_name.endswith(".arrow") and \
+                os.path.join(store, file_name) != path:
+            os.remove(os.path.join(store, file_name))
+    return path
+
+
+def open_frame(path):
+    """DataFrame over the memory-mapped Arrow file at `path`."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def _read_manifest(store):
+    try:
+        with open(os.path.join(store, SNAPSHOT_MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get("items", {}) if manifest.get("format") == SNAPSHOT_FORMAT else {}
+
+
+def save_snapshot(name, version, value, store=FRAME_STORE):
+    """
+    Record `value` as the latest (name, version) for the next start. Frames are published
+    as Arrow files, small JSON values (the locations map) go in the manifest itself.
+    Returns False when the value can't be stored.
+    """
+    if isinstance(value, pd.DataFrame):
+        path = publish(name, version, value, store)
+        if path is None:
+            return False
+        item = {"version": version, "file": os.path.basename(path)}
+    else:
+        item = {"version": version, "value": value}
+
+    with _lock:
+        items = _read_manifest(store)
+        items[name] = item
+        os.makedirs(store, exist_ok=True)
+        path = os.path.join(store, SNAPSHOT_MANIFEST)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"format": SNAPSHOT_FORMAT, "items": items}, f)
+        os.replace(tmp_path, path)
+    return True
+
+
+def load_snapshot(name, store=FRAME_STORE):
+    """(version, value) of the last snapshot of `name`, frames memory-mapped; None if there is none."""
+    item = _read_manifest(store).get(name)
+    if item is None:
+        return None
+    if "file" not in item:
+        return item["version"], item["value"]
+    try:
+        return item["version"], open_frame(os.path.join(store, item["file"]))
+    except (OSError, ValueError):
+        # replaced by a newer version since the manifest was read, or unreadable
+        return None
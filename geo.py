@@ -0,0 +1,177 @@
+"""
+Coordinates for cities and depot locations.
+
+Each distinct name is resolved once: from the persistent cache, then the bundled
+gazetteer, then (unless running offline) Nominatim. Nominatim is queried in a background
+thread, so a render never waits on it: the name has NaN coordinates until the lookup lands
+and is drawn on the next rerun. Hits and names Nominatim doesn't know are written back to
+the cache so nothing is geocoded again on later reruns or restarts; failed lookups
+(timeouts, service errors) are only remembered in memory and retried after a while.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from const import CACHE_DIR
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "gazetteer.csv")
+GEO_CACHE = os.path.join(CACHE_DIR, "geocode_cache.json")
+# GEO_OFFLINE=1 resolves from the cache and bundled gazetteer only
+GEO_OFFLINE = os.environ.get("GEO_OFFLINE", "0") == "1"
+# GEO_WAIT=1 waits for Nominatim instead of filling the coordinates on a later rerun (batch export)
+GEO_WAIT = os.environ.get("GEO_WAIT", "0") == "1"
+# seconds before a name whose Nominatim lookup failed is tried again
+RETRY_AFTER = 600
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# failed: name -> time of the failed lookup; pending: names being looked up
+_memory = {"cache": None, "gazetteer": None, "offline_misses": set(), "failed": {}, "pending": set()}
+
+
+def normalize_name(name):
+    return " ".join(str(name).replace(",", " , ").split()).strip(" ,").lower()
+
+
+def _split_country(name):
+    """'Houston, US' -> ('houston', 'US'); the country part is optional."""
+    import pycountry
+
+    place, _, country = normalize_name(name).partition(" , ")
+    if not country:
+        return place, None
+    try:
+        return place, pycountry.countries.lookup(country).alpha_2
+    except LookupError:
+        # not a country (e.g. a state code), match on the place alone
+        return place, None
+
+
+def _load_gazetteer():
+    if _memory["gazetteer"] is None:
+        gazetteer = pd.read_csv(GAZETTEER_PATH)
+        gazetteer["key"] = gazetteer["name"].map(normalize_name)
+        _memory["gazetteer"] = gazetteer
+    return _memory["gazetteer"]
+
+
+def _load_cache(path=GEO_CACHE):
+    if _memory["cache"] is None:
+        try:
+            with open(path) as f:
+                _memory["cache"] = json.load(f)
+        except (OSError, ValueError):
+            _memory["cache"] = {}
+    return _memory["cache"]
+
+
+def _save_cache(cache, path=GEO_CACHE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _from_gazetteer(name):
+    gazetteer = _load_gazetteer()
+    place, country = _split_country(name)
+    matches = gazetteer[gazetteer["key"] == place]
+    if country is not None and (matches["country"] == country).any():
+        matches = matches[matches["country"] == country]
+    if matches.empty:
+        return None
+    return [float(matches["lat"].iloc[0]), float(matches["lon"].iloc[0])]
+
+
+def _from_nominatim(names):
+    """
+    ({name: coordinates, or None when Nominatim doesn't know it}, [names whose lookup failed]).
+    """
+    import pycountry
+    from geopy.exc import GeopyError
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.geocoders import Nominatim
+
+    geocode = RateLimiter(Nominatim(user_agent="inventory-insights-dashboard").geocode, min_delay_seconds=1,
+                          max_retries=1, swallow_exceptions=False)
+    resolved, failed = {}, []
+    for name in names:
+        place, country = _split_country(name)
+        country = pycountry.countries.get(alpha_2=country) if country is not None else None
+        query = place if country is None else f"{place}, {country.name}"
+        try:
+            location = geocode(query)
+        except GeopyError as e:
+            logger.warning("geocoding %r failed: %s", query, e)
+            failed.append(name)
+            continue
+        resolved[name] = [location.latitude, location.longitude] if location else None
+    return resolved, failed
+
+
+def _geocode(names):
+    """Look `names` up in Nominatim and store the outcome; runs without holding `_lock`."""
+    try:
+        resolved, failed = _from_nominatim(names)
+    except Exception:
+        logger.warning("geocoding failed", exc_info=True)
+        resolved, failed = {}, names
+    with _lock:
+        _memory["pending"].difference_update(names)
+        _memory["failed"].update({name: time.monotonic() for name in failed})
+        if resolved:
+            cache = _load_cache()
+            cache.update(resolved)
+            _save_cache(cache)
+
+
+def resolve_locations(names, offline=GEO_OFFLINE, wait=GEO_WAIT):
+    """
+    Latitude/longitude for each distinct name, as a DataFrame indexed by the original name.
+    Names that can't be resolved, or are still being looked up, have NaN coordinates.
+    """
+    distinct = pd.Series(pd.unique(pd.Series(names).dropna().astype(str)))
+    keys = distinct.map(normalize_name)
+
+    with _lock:
+        cache = _load_cache()
+        now = time.monotonic()
+        missing = [key for key in keys.unique()
+                   if key not in cache and key not in _memory["pending"]
+                   and now - _memory["failed"].get(key, -RETRY_AFTER) >= RETRY_AFTER
+                   and not (offline and key in _memory["offline_misses"])]
+        unresolved = []
+        if missing:
+            resolved = {key: _from_gazetteer(key) for key in missing}
+            resolved = {key: coords for key, coords in resolved.items() if coords is not None}
+            unresolved = [key for key in missing if key not in resolved]
+            if unresolved and offline:
+                # remembered for the process only, so a later online run can still resolve them
+                _memory["offline_misses"].update(unresolved)
+                unresolved = []
+            _memory["pending"].update(unresolved)
+            if resolved:
+                cache.update(resolved)
+                _save_cache(cache)
+
+    if unresolved and wait:
+        _geocode(unresolved)
+    elif unresolved:
+        threading.Thread(target=_geocode, args=(unresolved,), name="geocode", daemon=True).start()
+
+    with _lock:
+        coords = [cache.get(key) or [float("nan"), float("nan")] for key in keys]
+
+    return pd.DataFrame(coords, columns=["lat", "lon"], index=pd.Index(distinct, name="name"))
+
+
+def with_coordinates(df: pd.DataFrame, column):
+    """`df` with `lat`/`lon` columns joined on `column`, resolving each distinct value once."""
+    coords = resolve_locations(df[column])
+    return df.join(coords, on=column)
@@ -0,0 +1,62 @@
+"""
+Import-time report for the dashboard's startup path.
+
+Runs `python -X importtime` over the modules app.py imports before the first tab renders,
+prints the slowest imports the app adds on top of streamlit itself, and exits non-zero if
+any library that should be deferred to its tab shows up in the startup graph.
+
+    python import_report.py [--top 15]
+"""
+import argparse
+import subprocess
+import sys
+
+STARTUP_IMPORTS = ["streamlit_option_menu", "css.st_ui", "dataset", "views"]
+
+# libraries that must only load once the tab that needs them is opened
+DEFERRED = {
+    "yfinance": "Macro",
+    "bs4": "Calendar / News / Macro (WCI)",
+    "lxml": "News",
+    "requests": "Calendar / News / Macro (WCI)",
+    "plotly.express": "Trading Prices",
+    "streamlit_gsheets": "sheet-backed tabs",
+    "gspread": "sheet-backed tabs",
+}
+
+
+def import_times(statement):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():  # skip the header row
+            times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    baseline = import_times("import streamlit")
+    startup = import_times("; ".join(["import streamlit"] + [f"import {m}" for m in STARTUP_IMPORTS]))
+    added = {module: t for module, t in startup.items() if module not in baseline}
+
+    total_ms = sum(self_us for self_us, _ in added.values()) / 1000
+    print(f"app startup imports on top of streamlit: {len(added)} modules, {total_ms:.1f} ms")
+    for module, (self_us, cumulative_us) in sorted(added.items(), key=lambda kv: -kv[1][1])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    leaked = [m for m in DEFERRED if m in startup]
+    for module in leaked:
+        print(f"FAIL: {module} is imported at startup, it should load with the {DEFERRED[module]} tab")
+    return 1 if leaked else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,10 @@
 import pandas as pd
 import streamlit as st
-import datetime
-import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from utils import get_commodities_data
+from render import dataframe
+from utils import month_starts, current_month_code, monthly_counts, monthly_totals, filter_rows, take
 
 colors = ["#264653", "#2a9d8f", "#e9c46a", "#f4a261", "#e76f51", "#84a59d", "#006d77",
           "#f6bd60", "#90be6d", "#577590", "#e07a5f", "#81b29a", "#f2cc8f", "#0081a7"]
@@ -14,90 +13,13 @@ months_list = ['January', 'February', 'March', 'April', 'May', 'June',
                'July', 'August', 'September', 'October', 'November', 'December']
 
 
-def get_weekly_data_table(df):
-    for col in df.columns:
-        if "Price" in col:
-            df[col] = df[col].apply(lambda x: f"${x:.2f}")
-    fill_colors =  ["#778da9", "#415a77"] * len(df)
-    fill_colors = ["#2f3e46", "#354f52", "#52796f"] * len(df)
-    fill_colors = fill_colors[:len(df)]
-
-    # Function to determine font color based on value
-    def get_font_color(column_values):
-        return ["#e63946" if val == 0 else "#52b788" for val in column_values]
-
-    ammt_market_price_values = df["AMMT Market Price"].tolist()
-    avg_market_price_values = df["Avg Market Price"].tolist()
-    ammt_market_price_display = [
-        f"🔺 {value}" if value > avg_market_price_values[i] else str(value)
-        for i, value in enumerate(ammt_market_price_values)
-    ]
-
-    # Get font colors for "Real Time" and "On the way" columns
-    real_time_font_color = get_font_color(df["Real Time"])
-    on_the_way_font_color = get_font_color(df["On the way"])
-    fig = go.Figure(data=[go.Table(
-        columnwidth=[2, 2, 2, 2, 2, 2, 2, 2],
-        header=dict(
-            values=["🏷️ Name", "📍 Location", "🔍 Condition", "📏 Size" , "⏳ Real Time", "🚛 On the way", "💰 Avg Market Price", "📈 AMMT Market Price"],
-            fill_color="#1b263b",
-            font=dict(family="ubuntu", color="#adb5bd", size=18, weight="bold"),
-            align="center",
-            line_color="black",
-            height=50,
-            line_width=0,
-        ),
-        cells=dict(
-            values=[
-                df["Name"].tolist(),
-                df["Location"].tolist(),
-                df["Condition"].tolist(),
-                df["Size"].tolist(),
-                df["Real Time"].tolist(),
-                df["On the way"].tolist(),
-                df["Avg Market Price"].tolist(),
-                ammt_market_price_display  # Use the modified "AMMT Market Price" values
-            ],
-            fill_color=[fill_colors * len(df.columns)],
-            font=dict(family="ubuntu", color="#ced4da", size=14, weight="bold"),
-            align="center",
-            height=45,
-            line_width=0,
-            line_color="black"
-        )
-    )])
-
-    fig.update_traces(
-        cells=dict(
-            font=dict(
-                color=[["white"] * len(df)] * (df.columns.get_loc("Real Time")) +  # Default white for columns before "Real Time"
-                      [real_time_font_color] +  # Font color for "Real Time"
-                      [["white"] * len(df)] * (df.columns.get_loc("On the way") - df.columns.get_loc("Real Time") - 1) +  # Default white for columns between "Real Time" and "On the way"
-                      [on_the_way_font_color] +  # Font color for "On the way"
-                      [["white"] * len(df)] * (len(df.columns) - df.columns.get_loc("On the way") - 1)  # Default white for columns after "On the way"
-            )
-        )
-    )
-
-    fig.update_layout(margin=dict(l=10, r=0, t=20, b=20), height=60*(len(df)+2))
-
-    return fig
-
-
-def sales_overtime(data, location, depot):
-    if not location:
-        location = set(data['Location'])
-    if not depot:
-        depot = set(data['Depot'])
-    data = data[(data['Location'].isin(location)) & (data['Depot'].isin(depot))]
-    data['Gate Out'] = pd.to_datetime(data['Gate Out'], errors='coerce')
-    data['Month-Year'] = data['Gate Out'].dt.strftime('%b %y')
-
+def sales_overtime(data, location, depot, rows=None):
+    data = take(data, filter_rows(data, location, depot) if rows is None else rows, ['Status', 'Gate Out Month', 'Sale Price'])
     sold_data = data[data['Status'] == 'SOLD']
-    sold_over_time = sold_data.groupby('Month-Year')['Sale Price'].sum().reset_index()
-    sold_over_time['Month-Year'] = pd.to_datetime(sold_over_time['Month-Year'], format='%b %y')
-    sold_over_time = sold_over_time[sold_over_time['Month-Year'] <= datetime.datetime.today()]
-    sold_over_time = sold_over_time.sort_values(by='Month-Year')
+    sold_over_time = monthly_totals(sold_data, 'Gate Out Month', 'Sale Price')
+    sold_over_time = sold_over_time[sold_over_time.index <= current_month_code()]
+    sold_over_time = pd.DataFrame({'Month-Year': month_starts(sold_over_time.index),
+                                   'Sale Price': sold_over_time.to_numpy()})
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -121,23 +43,18 @@ def sales_overtime(data, location, depot):
     return fig
 
 
-def sold_inv_dist(data, location, depot):
-    if not location:
-        location = set(data['Location'])
-    if not depot:
-        depot = set(data['Depot'])
-    data = data[(data['Location'].isin(location)) & (data['Depot'].isin(depot))]
-
+def sold_inv_dist(data, location, depot, rows=None):
+    data = take(data, filter_rows(data, location, depot) if rows is None else rows, ['Status', 'Size', 'Unit #'])
     sold_data = data[data['Status'] == 'SOLD']
 
     sales_dist = sold_data.groupby('Size')['Unit #'].count().reset_index()
     sales_dist = sales_dist.sort_values(by='Unit #', ascending=False)
 
     top_5 = sales_dist.head(5)
-    other = sales_dist.tail(len(sales_dist) - 5).sum()
-    other['Size'] = 'Other'  # Assign 'Other' to the aggregated row
+    # the remaining sizes aggregated into one 'Other' row
+    other = pd.DataFrame({'Size': ['Other'], 'Unit #': [sales_dist['Unit #'].iloc[5:].sum()]})
 
-    sales_dist = pd.concat([top_5, other.to_frame().T], ignore_index=True)
+    sales_dist = pd.concat([top_5, other], ignore_index=True)
 
     fig = go.Figure()
     fig.add_trace(go.Pie(
@@ -159,29 +76,15 @@ def sold_inv_dist(data, location, depot):
     return fig
 
 
-def gate_in_out_distribution(data, location, depot):
-    if not location:
-        location = set(data['Location'])
-    if not depot:
-        depot = set(data['Depot'])
+def gate_in_out_distribution(data, location, depot, rows=None):
+    data = take(data, filter_rows(data, location, depot) if rows is None else rows, ['Gate In Month', 'Gate Out Month'])
 
-    data = data[(data['Location'].isin(location)) & (data['Depot'].isin(depot))]
-
-    data['Gate In'] = pd.to_datetime(data['Gate In'], errors='coerce')
-    data['Gate Out'] = pd.to_datetime(data['Gate Out'], errors='coerce')
-
-    data['Month-Year In'] = data['Gate In'].dt.strftime('%b %y')
-    data['Month-Year Out'] = data['Gate Out'].dt.strftime('%b %y')
-
-    gate_in_count = data.groupby('Month-Year In').size().reset_index(name='Gate In Count')
-    gate_out_count = data.groupby('Month-Year Out').size().reset_index(name='Gate Out Count')
-
-    merged_counts = pd.merge(gate_in_count, gate_out_count, left_on='Month-Year In', right_on='Month-Year Out', how='outer')
-    merged_counts['Month-Year'] = merged_counts['Month-Year In'].fillna(merged_counts['Month-Year Out'])
-    merged_counts['Month-Year'] = pd.to_datetime(merged_counts['Month-Year'], format='%b %y')
-    merged_counts = merged_counts[merged_counts['Month-Year'] <= datetime.datetime.today()]
-    merged_counts = merged_counts.sort_values(by='Month-Year')
-    # merged_counts = merged_counts.sort_values('Month-Year')
+    # gate-in and gate-out counts per month code in one groupby
+    merged_counts = monthly_counts(data, ['Gate In Month', 'Gate Out Month'])
+    merged_counts = merged_counts[merged_counts.index <= current_month_code()]
+    merged_counts = pd.DataFrame({'Month-Year': month_starts(merged_counts.index),
+                                  'Gate In Count': merged_counts['Gate In Month'].to_numpy(),
+                                  'Gate Out Count': merged_counts['Gate Out Month'].to_numpy()})
 
     fig = go.Figure()
 
@@ -211,13 +114,8 @@ def gate_in_out_distribution(data, location, depot):
 
 
 
-def top_customers(data, location, depot):
-    if not location:
-        location = set(data['Location'])
-    if not depot:
-        depot = set(data['Depot'])
-
-    data = data[(data['Location'].isin(location)) & (data['Depot'].isin(depot))]
+def top_customers(data, location, depot, rows=None):
+    data = take(data, filter_rows(data, location, depot) if rows is None else rows, ['Customer'])
     customer_counts = data.groupby('Customer').size().reset_index(name='Item Count')
     top_8_customers = customer_counts.sort_values(by='Item Count', ascending=False).head(8)
     top_8_customers = top_8_customers.sort_values(by='Item Count', ascending=True)
@@ -246,11 +144,8 @@ def top_customers(data, location, depot):
 # ------------------------- Macro ------------------------------------------------------------
 
 def container_prices_and_count(data):
-    data['MONTH_YEAR'] = data['DATE'].dt.to_period('M')
-    data = data.groupby(['MONTH_YEAR', 'CITY']).agg({'MARKET_PRICE_USD': "sum",
-                                                     "CONTAINER_COUNT": "sum"}).reset_index()
-    data = data.sort_values(by='MONTH_YEAR')
-    data['MONTH_YEAR'] = data['MONTH_YEAR'].dt.strftime('%b %Y')
+    data = monthly_totals(data, 'MONTH_CODE', ['MARKET_PRICE_USD', 'CONTAINER_COUNT'], by=['CITY']).reset_index()
+    data['MONTH_YEAR'] = month_starts(data['MONTH_CODE']).dt.strftime('%b %Y')
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(
@@ -287,57 +182,38 @@ def container_prices_and_count(data):
     return fig
 
 
-def commodities_info(commodities):
-    for i in commodities:
-        st.write(f"### {i.name} Commodities Data")
-        with st.spinner('Fetching data...'):
-            df = get_commodities_data(i.name, i.value)
-
-        col_config = {
-            "Trend": st.column_config.AreaChartColumn(
-                "Closing Trend",
-                width="medium",
-                help="The Closing trend for a month",
-            ),
-        }
-        st.data_editor(
-            df,
-            column_config=col_config,
-            hide_index=True,
-            use_container_width=True
-        )
-
-
-def get_wci_chart(df):
-    fill_colors =  ["#eff6e0", "#aec3b0"] * len(df)
-    # fill_colors = ["#2f3e46", "#354f52", "#52796f"] * len(df)
-    fill_colors = fill_colors[:len(df)]
-    df['Annual change (%)'] = df['Annual change (%)'].apply(lambda x: f"🔻{x}" if x.split()[0] == "Down" else f"📈{x}")
-
-    fig = go.Figure(data=[go.Table(
-        columnwidth=[2, 2, 2, 2, 2, 2, 2, 2],
-        header=dict(
-            values=df.columns,
-            fill_color="#124559",
-            font=dict(family="ubuntu", color="white", size=18, weight="bold"),
-            align="center",
-            line_color="black",
-            height=50,
-            line_width=0,
+def commodities_info(container, ticker_name, table):
+    col_config = {
+        "%age Diff": st.column_config.NumberColumn(format="%.3f%%"),
+        "Trend": st.column_config.AreaChartColumn(
+            "Closing Trend",
+            width="medium",
+            help="The Closing trend for a month",
         ),
-        cells=dict(
-            values=[df[col] for col in df.columns],
-            fill_color=[fill_colors * len(df.columns)],
-            font=dict(family="ubuntu", color="black", size=14, weight="bold"),
-            align="center",
-            height=45,
-            line_width=0,
-            line_color="black"
-        )
-    )])
+    }
+    dataframe(container, table, name=f"{ticker_name} Commodities", column_config=col_config, hide_index=True)
+
 
-    fig.update_layout(margin=dict(l=0, r=0, t=10, b=5), height=60*(len(df)))
+def wci_trend_plot(history):
+    # first table column names the route, the first mostly-numeric column is the rate
+    table_columns = [col for col in history.columns if col not in ("Scraped At", "Snapshot Hash")]
+    route_col = table_columns[0]
+    values = history[table_columns[1:]].replace(r"[^0-9.\-]", "", regex=True).apply(pd.to_numeric, errors="coerce")
+    value_col = values.notna().mean().idxmax()
+    data = pd.DataFrame({"Route": history[route_col], "Rate": values[value_col],
+                         "Scraped At": history["Scraped At"]}).dropna()
 
+    fig = go.Figure()
+    for ind, (route, route_data) in enumerate(data.groupby("Route", sort=False)):
+        fig.add_trace(go.Scatter(
+            x=route_data["Scraped At"], y=route_data["Rate"],
+            mode="lines+markers", name=route,
+            line=dict(color=colors[ind % len(colors)]),
+            hovertemplate=f"{route}: $%{{y:,.0f}}<extra></extra>"
+        ))
+    fig.update_layout(title=f"WCI {value_col} over time", yaxis_title=value_col,
+                      legend=dict(orientation="h", xanchor='center', x=0.5, y=-0.25))
+    fig = format_hover_layout(fig)
     return fig
 
 
@@ -446,14 +322,20 @@ def monthly_sales_plot(data):
     return fig
 
 
-def sales_cost_breakdown_plot(data):
+def sales_cost_breakdown_plot(data, sales=None):
+    # stacked average cost per unit, with the average sale price over it
     fig = go.Figure()
     i = 0
     for cost in data.columns:
-        fig.add_trace(go.Bar(x=data.index, y=data[cost], name=cost, marker=dict(color=colors[i])))
+        fig.add_trace(go.Bar(x=data.index, y=data[cost], name=cost, marker=dict(color=colors[i]),
+                             hovertemplate='$%{y:.0f}'))
         i += 1
+    if sales is not None:
+        fig.add_trace(go.Scatter(x=sales.index, y=sales, name=sales.name, mode='lines+markers',
+                                 marker=dict(color=colors[4]), line=dict(color=colors[4]),
+                                 hovertemplate='$%{y:.0f}'))
     fig.update_layout(
-        title="AVG. YEARLY SALES VS. COST BREAKDOWN",
+        title="AVG. SALES VS. COST BREAKDOWN PER UNIT",
         xaxis_title="Months", yaxis_title="Cost", barmode='stack',
         legend_title="Cost"
     )
@@ -462,6 +344,26 @@ def sales_cost_breakdown_plot(data):
     return fig
 
 
+def margin_by_group_plot(summary, group):
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(
+        go.Bar(x=summary[group], y=summary["Avg Margin"], name="Avg Margin per Unit",
+               marker=dict(color=colors[1]), hovertemplate='$%{y:.0f}'),
+        secondary_y=False
+    )
+    fig.add_trace(
+        go.Scatter(x=summary[group], y=summary["ROI %"], name="ROI", mode="markers",
+                   marker=dict(color=colors[4], size=10), hovertemplate='%{y:.1f}%<extra></extra>'),
+        secondary_y=True
+    )
+    fig.update_layout(title=f"Margin & ROI by {group}", xaxis_title=group, yaxis_title="Margin per Unit",
+                      legend=dict(orientation="h", xanchor='center', x=0.5, y=-0.25))
+    fig.update_yaxes(title_text="ROI %", secondary_y=True)
+    fig = format_hover_layout(fig)
+
+    return fig
+
+
 def inventory_plot(data):
     fig = go.Figure()
     fig.add_trace(
@@ -505,6 +407,27 @@ def inventory_per_depot(data):
     return fig
 
 
+def aging_buckets_plot(summary, buckets):
+    # stacked unsold units per aging bucket, one bar per depot
+    bucket_colors = ["#2a9d8f", "#e9c46a", "#f4a261", "#e76f51"]
+    fig = go.Figure()
+    for bucket, color in zip(buckets, bucket_colors):
+        fig.add_trace(
+            go.Bar(x=summary["Depot"], y=summary[bucket], name=bucket,
+                   marker=dict(color=color),
+                   hovertemplate='%{y} units<extra>' + bucket + '</extra>')
+        )
+    fig.update_layout(
+        barmode='stack',
+        title='Unsold Inventory Aging by Depot',
+        xaxis_title='Depot',
+        yaxis_title='Units',
+        legend=dict(orientation="h", xanchor='center', x=0.5, y=-0.25))
+    fig = format_hover_layout(fig)
+
+    return fig
+
+
 def shipping_costs_plot(data, size):
     fig = go.Figure()
     fig.add_trace(
@@ -525,17 +448,32 @@ def shipping_costs_plot(data, size):
     return fig
 
 
-def container_prices_plot(data):
-    # Group by month and year, and sum the container counts
-    data['MONTH_YEAR'] = data['DATE'].dt.to_period('M')
-    data = data.groupby(['MONTH_YEAR', 'CITY']).agg({'MARKET_PRICE_USD': "sum",
-                                                     "CONTAINER_COUNT": "sum"}).reset_index()
+def landed_cost_plot(summary):
+    fig = go.Figure()
+    for ind, (size, size_data) in enumerate(summary.groupby("Size FT")):
+        fig.add_trace(
+            go.Bar(x=size_data["Location Name"], y=size_data["Landed Cost"],
+                   name=f"{size} FT",
+                   marker=dict(color=colors[ind % len(colors)]),
+                   customdata=size_data["Units"],
+                   hovertemplate='$%{y:,.0f} (%{customdata} units)')
+        )
+    fig.update_layout(
+        barmode='group',
+        title='Landed Cost per Unit (Purchase + Shipping)',
+        xaxis_title='Location',
+        yaxis_title="Amount($)",
+        legend_title="Size")
+    fig = format_hover_layout(fig)
+    return fig
+
 
-    # Sort the data by 'MONTH_YEAR'
-    data = data.sort_values(by='MONTH_YEAR')
+def container_prices_plot(data, forecast=None):
+    # Sum prices and container counts per month code, already sorted by month
+    data = monthly_totals(data, 'MONTH_CODE', ['MARKET_PRICE_USD', 'CONTAINER_COUNT'], by=['CITY']).reset_index()
 
-    # Convert 'MONTH_YEAR' to the desired string format for plotting
-    data['MONTH_YEAR'] = data['MONTH_YEAR'].dt.strftime('%b %Y')
+    # Month labels are formatted once per bucket
+    data['MONTH_YEAR'] = month_starts(data['MONTH_CODE']).dt.strftime('%b %Y')
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     ind = 0
@@ -563,6 +501,33 @@ def container_prices_plot(data):
         ),
         secondary_y=True
     )
+
+    # Forecast band for the following months, from `PriceForecasts.forecast`
+    if forecast is not None and len(forecast):
+        months = forecast['MONTH_YEAR'].dt.strftime('%b %Y')
+        fig.add_trace(
+            go.Scatter(
+                x=pd.concat([months, months[::-1]]),
+                y=pd.concat([forecast['Upper'], forecast['Lower'][::-1]]),
+                fill='toself',
+                fillcolor='rgba(231, 111, 81, 0.2)',
+                line=dict(width=0),
+                name='Forecast range',
+                hoverinfo='skip'
+            ),
+            secondary_y=False
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=months, y=forecast['Forecast'],
+                name='Forecast',
+                mode="lines+markers",
+                line=dict(color='#e76f51', dash='dash'),
+                hovertemplate='Forecast: $%{y:.0f}<extra></extra>'
+            ),
+            secondary_y=False
+        )
+
     fig.update_layout(
         title='Container Prices & Count overtime',
         xaxis_title='Date',
@@ -577,17 +542,13 @@ def container_prices_plot(data):
 
 
 def container_count_plot(data):
-    # Group by month and year, and sum the container counts
-    data['MONTH_YEAR'] = data['DATE'].dt.to_period('M')
-    data = data.groupby('MONTH_YEAR')['CONTAINER_COUNT'].sum().reset_index()
-
-    # Sort the data by 'MONTH_YEAR'
-    data = data.sort_values(by='MONTH_YEAR')
+    # Sum the container counts per month code, already sorted by month
+    data = monthly_totals(data, 'MONTH_CODE', ['CONTAINER_COUNT']).reset_index()
 
     data['Month-to-Month Change'] = data['CONTAINER_COUNT'].pct_change() * 100
     data['Month-to-Month Change'] = data['Month-to-Month Change'].fillna(0)
-    # Convert 'MONTH_YEAR' to the desired string format for plotting
-    data['MONTH_YEAR'] = data['MONTH_YEAR'].dt.strftime('%b %Y')
+    # Month labels are formatted once per bucket
+    data['MONTH_YEAR'] = month_starts(data['MONTH_CODE']).dt.strftime('%b %Y')
 
     fig = make_subplots(specs=[[{"secondary_y": True}]])
 
@@ -622,6 +583,8 @@ def container_count_plot(data):
 
 
 def get_market_price_map(data):
+    import plotly.express as px
+
     month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     # Ensure months are in chronological order
     month_to_number = {
@@ -669,6 +632,27 @@ def get_market_price_map(data):
     return fig
 
 
+def location_map(data, location_col, size_col, color_col, title, size_label, color_label):
+    from geo import with_coordinates
+
+    data = with_coordinates(data, location_col).dropna(subset=["lat", "lon"])
+    sizes = data[size_col].clip(lower=0)
+    fig = go.Figure(go.Scattergeo(
+        lat=data["lat"], lon=data["lon"],
+        text=data[location_col],
+        customdata=data[[size_col, color_col]],
+        marker=dict(size=8 + 32 * (sizes / sizes.max() if sizes.max() > 0 else sizes),
+                    color=data[color_col], colorscale='Emrld', showscale=True,
+                    colorbar=dict(title=color_label), line=dict(width=0.5, color='white')),
+        hovertemplate=f'<b>%{{text}}</b><br>{size_label}: %{{customdata[0]:,.0f}}'
+                      f'<br>{color_label}: $%{{customdata[1]:,.0f}}<extra></extra>'
+    ))
+    fig.update_geos(fitbounds="locations", showcountries=True, countrycolor="#adb5bd",
+                    showland=True, landcolor="#f5ebe0")
+    fig.update_layout(title=title, margin=dict(l=0, r=0, t=40, b=0), height=400)
+    return fig
+
+
 def container_prices_wrt_location(data):
     # Group by city, and sum the container prices
     data = data.groupby('CITY')['MARKET_PRICE_USD'].sum().reset_index()
@@ -702,7 +686,7 @@ def biggest_growth_and_drop_in_prices(data):
         'MARKET_PRICE_USD'].sum().reset_index()
 
     # Calculate the week-on-week change
-    grouped_data['Week-on-Week Change'] = grouped_data.groupby('CITY')['MARKET_PRICE_USD'].pct_change()
+    grouped_data['Week-on-Week Change'] = grouped_data.groupby('CITY')['MARKET_PRICE_USD'].pct_change() * 100
 
     # Filter out the first week for each city
     grouped_data = grouped_data.dropna()
@@ -718,40 +702,9 @@ def biggest_growth_and_drop_in_prices(data):
     biggest_drop = grouped_data.sort_values(by='Week-on-Week Change', ascending=True).drop_duplicates(
         subset='City Area')
 
-    biggest_growth['Week-on-Week Change'] = biggest_growth['Week-on-Week Change'].apply(
-        lambda x: str(round(x, 2)) + "%")
-    biggest_growth['Market Price'] = biggest_growth['Market Price'].apply(lambda x: '$'+str(x))
-    biggest_drop['Week-on-Week Change'] = biggest_drop['Week-on-Week Change'].apply(lambda x: str(round(x, 2)) + "%")
-    biggest_drop['Market Price'] = biggest_drop['Market Price'].apply(lambda x: '$'+str(x))
-
     return biggest_growth, biggest_drop
 
 
-def prices_variation_chart(data, indicator, table_title):
-    fig = go.Figure(data=[go.Table(
-        columnwidth=[1, 1, 1],
-        header=dict(
-            values=list(data.columns),
-            font=dict(size=18, color='white', family='ubuntu'),
-            fill_color='#264653',
-            align=['left', 'center'],
-            height=60
-        ),
-        cells=dict(
-            values=[data[K].tolist() for K in data.columns],
-            font=dict(size=12, color='black'),
-            font_size=12,
-            font_color=['black', 'black', indicator],
-            fill_color='#f0efeb',
-            height=40
-        )
-    )]
-    )
-    fig.update_layout(margin=dict(l=30, r=30, b=10, t=80), height=350,
-                      title=table_title)
-    return fig
-
-
 def format_hover_layout(fig):
     fig = fig.update_layout(
         height=400,
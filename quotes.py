@@ -0,0 +1,198 @@
+"""
+Intraday commodity quotes.
+
+In the daily mode the Macro tab downloads a month of closes per commodity group on every
+refresh. In intraday mode (COMMODITIES_QUOTE_INTERVAL > 0) that month is downloaded once a
+day into a ring buffer per symbol. Between, refreshes poll only the latest quotes, in one
+batched call of 5-minute bars for the current session covering every group's symbols, and
+patch the Price, Daily Change and %age Diff cells of each group's table. The Trend column is only rebuilt when a
+quote opens a new trading day, which pushes the day into the rings and drops the oldest.
+"""
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# seconds between quote polls; 0 keeps the daily mode
+QUOTE_INTERVAL = int(os.environ.get("COMMODITIES_QUOTE_INTERVAL", "0"))
+# about a month of trading days, the length of the Trend sparkline
+TREND_DAYS = 23
+# CME Globex hours: Sunday 18:00 to Friday 17:00 New York time, with a 17:00-18:00 daily break
+MARKET_TZ = "America/New_York"
+SESSION_OPEN_HOUR = 18
+
+_boards = {}
+_lock = threading.Lock()
+# the last quote poll, shared by the groups; its lock makes groups due together wait for one poll
+_poll = {"at": float("-inf"), "symbols": set(), "quotes": {}}
+_poll_lock = threading.Lock()
+
+
+def trading_day(timestamp):
+    """Trading day of a quote; an evening session counts toward the next day."""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(MARKET_TZ).tz_localize(None)
+    return (timestamp + pd.Timedelta(hours=24 - SESSION_OPEN_HOUR)).date()
+
+
+def market_open(now=None):
+    now = pd.Timestamp(now or pd.Timestamp.now(tz=MARKET_TZ))
+    now = now.tz_convert(MARKET_TZ) if now.tzinfo is not None else now.tz_localize(MARKET_TZ)
+    weekday, hour = now.weekday(), now.hour
+    if hour == SESSION_OPEN_HOUR - 1 or weekday == 5:
+        return False
+    if weekday == 4:
+        return hour < SESSION_OPEN_HOUR - 1
+    if weekday == 6:
+        return hour >= SESSION_OPEN_HOUR
+    return True
+
+
+class TrendRing:
+    """The last `size` daily closes of one symbol; the newest day can be patched in place."""
+
+    def __init__(self, days, closes, size=TREND_DAYS):
+        self._closes = np.full(size, np.nan)
+        self._days = [None] * size
+        self._start = self._count = 0
+        for day, close in zip(days, closes):
+            self.push(day, close)
+
+    def push(self, day, close):
+        slot = (self._start + self._count) % len(self._closes)
+        if self._count == len(self._closes):
+            self._start = (self._start + 1) % len(self._closes)
+        else:
+            self._count += 1
+        self._closes[slot], self._days[slot] = close, day
+
+    def _slot(self, i):
+        return (self._start + (i % self._count)) % len(self._closes)
+
+    @property
+    def last_day(self):
+        return self._days[self._slot(-1)]
+
+    def update(self, day, close):
+        """Record a quote: the newest day's close moves, a later day is pushed. True when pushed."""
+        if day == self.last_day:
+            self._closes[self._slot(-1)] = close
+            return False
+        if day > self.last_day:
+            self.push(day, close)
+            return True
+        return False
+
+    def previous_close(self):
+        return self._closes[self._slot(-2)]
+
+    def values(self):
+        return np.roll(self._closes, -self._start)[:self._count]
+
+
+class QuoteBoard:
+    """The table of one commodity group, kept current from quote polls."""
+
+    def __init__(self, ticker_name, commodities, closes):
+        self.ticker_name = ticker_name
+        self.loaded_on = datetime.date.today()
+        self.names, self.rings, self.health = [], {}, {}
+        for name, symbol in commodities.items():
+            trend = closes[symbol].dropna() if symbol in closes else pd.Series(dtype=float)
+            self.health[symbol] = len(trend) >= 2
+            if self.health[symbol]:
+                self.names.append((name, symbol))
+                self.rings[symbol] = TrendRing([trading_day(day) for day in trend.index], trend.to_numpy(dtype=float))
+        self.prices = np.array([self.rings[symbol].values()[-1] for _, symbol in self.names])
+        self.table = self._build()
+
+    def _build(self):
+        from utils import commodities_table
+
+        return commodities_table(self.ticker_name, [name for name, _ in self.names], self.prices,
+                                 [self.rings[symbol].previous_close() for _, symbol in self.names],
+                                 [self.rings[symbol].values() for _, symbol in self.names])
+
+    def patch(self, quotes):
+        """Apply the latest quotes, {symbol: (timestamp, price)}; returns the patched table."""
+        import pyarrow as pa
+
+        pushed = False
+        for i, (_, symbol) in enumerate(self.names):
+            if symbol in quotes:
+                timestamp, price = quotes[symbol]
+                pushed |= self.rings[symbol].update(trading_day(timestamp), price)
+                self.prices[i] = price
+        if pushed:
+            # a new trading day moved the trend window
+            self.table = self._build()
+            return self.table
+
+        previous = np.array([self.rings[symbol].previous_close() for _, symbol in self.names])
+        changes = self.prices - previous
+        # only the three quote cells change, the Trend column is reused as is
+        for column, values in [("Price", self.prices), ("Daily Change", changes),
+                               ("%age Diff", np.round(changes / previous * 100, 2))]:
+            index = self.table.schema.get_field_index(column)
+            self.table = self.table.set_column(index, column, pa.array(values, type=pa.float64()))
+        return self.table
+
+
+def latest_quotes(symbols):
+    """{symbol: (timestamp, price)} from the last 5-minute bar of the current session, in one batched call."""
+    from utils import download_closes
+
+    closes = download_closes(symbols, period="1d", interval="5m")
+    quotes = {}
+    for symbol in closes:
+        series = closes[symbol].dropna()
+        if len(series):
+            quotes[symbol] = (series.index[-1], float(series.iloc[-1]))
+    return quotes
+
+
+def poll_quotes(symbols):
+    """
+    Latest quotes for `symbols` and every loaded board's symbols. The groups are refreshed
+    together, so the first one due polls for all of them and the others reuse its result
+    for the rest of the interval.
+    """
+    with _poll_lock:
+        fresh = time.monotonic() - _poll["at"] < QUOTE_INTERVAL / 2
+        if not (fresh and set(symbols) <= _poll["symbols"]):
+            with _lock:
+                union = {symbol for board in _boards.values() for _, symbol in board.names} | set(symbols)
+            _poll.update(quotes=latest_quotes(sorted(union)), symbols=union, at=time.monotonic())
+        return _poll["quotes"]
+
+
+def intraday_table(ticker_name):
+    """
+    The group's table in intraday mode. The month of closes is downloaded on the first call
+    of the day; later calls only poll quotes, and none while the market is closed.
+    """
+    from symbols import due, record
+    from utils import download_closes
+
+    with _lock:
+        board = _boards.get(ticker_name)
+    if board is None or board.loaded_on != datetime.date.today():
+        commodities = due(ticker_name)
+        board = QuoteBoard(ticker_name, commodities, download_closes(list(commodities.values())))
+        if commodities and not board.names:
+            # nothing came back at all: a network or API outage, not dead symbols
+            raise RuntimeError(f"no {ticker_name} commodity data returned")
+        record(board.health)
+        with _lock:
+            _boards[ticker_name] = board
+        return board.table
+
+    if not market_open():
+        return board.table
+    quotes = poll_quotes([symbol for _, symbol in board.names])
+    with _lock:
+        return board.patch(quotes)
@@ -0,0 +1,233 @@
+"""
+Compact plotly figures before they are sent to the browser.
+
+Long scatter series are downsampled with Largest-Triangle-Three-Buckets and drawn with
+WebGL, long bar series along a number or date axis are averaged over consecutive buckets,
+per-point attributes that hold a single repeated value are collapsed to a scalar, and
+each chart's JSON payload is measured once, capped and recorded for the session.
+Tables go to Streamlit as typed Arrow tables, with their conversion time and size recorded
+the same way.
+"""
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+POINT_BUDGET = 2000
+MIN_POINT_BUDGET = 250
+PAYLOAD_BUDGET = 512 * 1024  # bytes of figure JSON per chart
+
+# per-point properties that plotly also accepts as a single value
+_PER_POINT_PROPS = [("text",), ("hovertext",), ("marker", "color"), ("marker", "size"),
+                    ("marker", "opacity"), ("marker", "symbol"), ("marker", "line", "color")]
+_SCATTER_ARRAYS = ["x", "y", "text", "hovertext", "customdata"]
+_BAR_ARRAYS = ["x", "y", "text", "hovertext", "customdata", "width", "base"]
+
+logger = logging.getLogger(__name__)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of `len(x)`."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = np.nan_to_num(y.astype(float))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket is the third vertex of the triangle
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def _numeric_x(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    try:
+        return pd.to_datetime(x).to_numpy(dtype="datetime64[ns]").view(np.int64).astype(float)
+    except (TypeError, ValueError):
+        # categorical axis, downsample on position
+        return np.arange(len(x), dtype=float)
+
+
+def _collapse_repeated(trace_json):
+    for path in _PER_POINT_PROPS:
+        parent = trace_json
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or path[-1] not in parent:
+            continue
+        values = parent[path[-1]]
+        if not isinstance(values, (list, tuple, np.ndarray)) or len(values) < 2:
+            continue
+        values = np.asarray(values, dtype=object)
+        if values.ndim == 1 and (values == values[0]).all():
+            parent[path[-1]] = values[0]
+    return trace_json
+
+
+def _continuous(values):
+    """True for numbers and dates; category labels (customers, cities) can't be merged into a bucket."""
+    return pd.api.types.infer_dtype(np.asarray(values), skipna=True) in (
+        "integer", "floating", "mixed-integer-float", "decimal", "datetime", "datetime64", "date")
+
+
+def _bucket_bars(trace_json, point_budget):
+    """Average the bars of a long bar trace over `point_budget` consecutive buckets."""
+    value_key = "x" if trace_json.get("orientation") == "h" else "y"
+    try:
+        values = np.asarray(trace_json[value_key], dtype=float)
+    except (TypeError, ValueError):
+        return trace_json
+    n = len(values)
+    starts = np.linspace(0, n, point_budget, endpoint=False).astype(int)
+    counts = np.add.reduceat(~np.isnan(values), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.add.reduceat(np.nan_to_num(values), starts) / counts
+    # the other per-bar arrays (category labels, hover text) keep the bucket's first bar
+    for key in _BAR_ARRAYS:
+        values = trace_json.get(key)
+        if isinstance(values, (list, tuple, np.ndarray)) and len(values) == n:
+            trace_json[key] = np.asarray(values, dtype=object)[starts]
+    trace_json[value_key] = means
+    marker = trace_json.get("marker", {})
+    for key in ("color", "opacity"):
+        values = marker.get(key)
+        if isinstance(values, (list, tuple, np.ndarray)) and len(values) == n:
+            marker[key] = np.asarray(values, dtype=object)[starts]
+    return trace_json
+
+
+def _compact_trace(trace, point_budget):
+    trace_json = _collapse_repeated(trace.to_plotly_json())
+    if trace_json.get("type") == "bar":
+        horizontal = trace_json.get("orientation") == "h"
+        values, positions = trace_json.get("x" if horizontal else "y"), trace_json.get("y" if horizontal else "x")
+        # only bars along a number or date axis are merged, a categorical axis is left as is
+        if values is not None and len(values) > point_budget and positions is not None and _continuous(positions):
+            trace_json = _bucket_bars(trace_json, point_budget)
+        return type(trace)(trace_json)
+    if trace_json.get("type") not in ("scatter", "scattergl") or trace_json.get("y") is None:
+        return type(trace)(trace_json)
+
+    n = len(trace_json["y"])
+    if n > point_budget:
+        keep = lttb(_numeric_x(trace_json.get("x", np.arange(n))), np.asarray(trace_json["y"]), point_budget)
+        for key in _SCATTER_ARRAYS:
+            values = trace_json.get(key)
+            if isinstance(values, (list, tuple, np.ndarray)) and len(values) == n:
+                trace_json[key] = np.asarray(values, dtype=object)[keep]
+        marker = trace_json.get("marker", {})
+        for key in ("color", "size"):
+            values = marker.get(key)
+            if isinstance(values, (list, tuple, np.ndarray)) and len(values) == n:
+                marker[key] = np.asarray(values, dtype=object)[keep]
+
+    if n > point_budget and trace_json["type"] == "scatter":
+        trace_json.pop("type")
+        try:
+            return go.Scattergl(trace_json)
+        except ValueError:
+            # properties WebGL does not support (e.g. spline lines), keep the SVG trace
+            trace_json["type"] = "scatter"
+    return type(trace)(trace_json)
+
+
+def compact_figure(fig: go.Figure, point_budget=POINT_BUDGET):
+    traces = [_compact_trace(trace, point_budget) for trace in fig.data]
+    return go.Figure(data=traces, layout=fig.layout)
+
+
+def figure_payload(fig: go.Figure):
+    return len(fig.to_json().encode())
+
+
+def _point_count(fig: go.Figure):
+    return sum(len(values) for trace in fig.data for values in [getattr(trace, "y", None), getattr(trace, "x", None)]
+               if isinstance(values, (list, tuple, np.ndarray)))
+
+
+def plotly_chart(container, fig: go.Figure, name=None, **kwargs):
+    """
+    Drop-in for `container.plotly_chart(fig, use_container_width=True)`.
+    The figure JSON is measured once; when it is over PAYLOAD_BUDGET the point budget is
+    cut in proportion and the new size estimated from the point count, which is what the
+    payload mostly consists of. The size is logged and kept in
+    `st.session_state["chart_payloads"]` under `name` (by default the figure title).
+    """
+    budget = POINT_BUDGET
+    compact = compact_figure(fig, budget)
+    payload = figure_payload(compact)
+    if payload > PAYLOAD_BUDGET:
+        points = _point_count(compact)
+        budget = max(MIN_POINT_BUDGET, int(budget * PAYLOAD_BUDGET / payload))
+        compact = compact_figure(fig, budget)
+        payload = int(payload * _point_count(compact) / points) if points else payload
+
+    title = name or fig.layout.title.text or "untitled " + ", ".join(
+        [trace.name or trace.type for trace in fig.data] or ["figure"])
+    st.session_state.setdefault("chart_payloads", {})[title] = payload
+    logger.info("%s: %.1f KB (point budget %d)", title, payload / 1024, budget)
+    if payload > PAYLOAD_BUDGET:
+        logger.warning("%s is still %.1f KB after downsampling", title, payload / 1024)
+
+    kwargs.setdefault("use_container_width", True)
+    return container.plotly_chart(compact, **kwargs)
+
+
+def to_arrow(data):
+    """
+    Arrow table for `data`; a DataFrame is converted once, without its index. Object
+    columns Arrow can't type (mixed values) are sent as strings, missing values kept.
+    """
+    import pyarrow as pa
+
+    if isinstance(data, pa.Table):
+        return data
+    try:
+        return pa.Table.from_pandas(data, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        objects = data.select_dtypes(include="object")
+        data = data.assign(**{column: objects[column].astype(str).where(objects[column].notna())
+                              for column in objects.columns})
+        return pa.Table.from_pandas(data, preserve_index=False)
+
+
+def dataframe(container, data, name, **kwargs):
+    """
+    Drop-in for `container.dataframe(data, use_container_width=True)`.
+    Streamlit gets an Arrow table, so typed columns (numbers, lists) skip its object-dtype
+    fallbacks; the conversion time and table size are kept in `st.session_state["table_payloads"]`.
+    """
+    start = time.perf_counter()
+    table = to_arrow(data)
+    elapsed = time.perf_counter() - start
+
+    st.session_state.setdefault("table_payloads", {})[name] = (table.nbytes, elapsed)
+    logger.info("%s: %.1f KB Arrow, converted in %.1f ms", name, table.nbytes / 1024, elapsed * 1000)
+
+    kwargs.setdefault("use_container_width", True)
+    return container.dataframe(table, **kwargs)
+
+
+def payload_report():
+    """Payload size of every chart and table the session sent, for the Diagnostics panel."""
+    payloads = st.session_state.get("chart_payloads", {})
+    tables = st.session_state.get("table_payloads", {})
+    return pd.DataFrame({"Chart": list(payloads) + list(tables),
+                         "Kind": ["figure JSON"] * len(payloads) + ["Arrow table"] * len(tables),
+                         "Payload (KB)": [round(v / 1024, 1) for v in payloads.values()] +
+                                         [round(size / 1024, 1) for size, _ in tables.values()]})
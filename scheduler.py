@@ -0,0 +1,115 @@
+"""
+Page-render scheduler.
+
+A page declares the figures it shows as builders over named inputs. Inputs shared by
+several figures (filtered rows, grouped frames) are computed once, then the figures are
+built concurrently on a thread pool shared by all sessions. Every step is timed, so the
+slowest figure, the page's critical path, shows up in `render_report`.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+# RENDER_THREADS=1 builds the figures one after the other on the script thread
+RENDER_THREADS = int(os.environ.get("RENDER_THREADS", min(4, os.cpu_count() or 1)))
+
+logger = logging.getLogger(__name__)
+
+_pool = {"executor": None}
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    with _pool_lock:
+        if _pool["executor"] is None:
+            _pool["executor"] = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix="render")
+        return _pool["executor"]
+
+
+def _reset_after_fork():
+    # a forked child (the export's worker processes) inherits the pool without its threads
+    global _pool_lock
+    _pool["executor"], _pool_lock = None, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _timed(builder, args):
+    start = time.perf_counter()
+    value = builder(*args)
+    return value, time.perf_counter() - start
+
+
+class RenderPlan:
+    """The figures of one page render, each declared with the shared inputs it reads."""
+
+    def __init__(self, name):
+        self.name = name
+        self._inputs = {}
+        self._figures = {}
+        # the computed inputs, after `run`
+        self.values = {}
+
+    def input(self, name, builder, *needs):
+        """A value computed once before the figures, from the earlier inputs named in `needs`."""
+        self._inputs[name] = (builder, needs)
+        return self
+
+    def figure(self, name, builder, *needs):
+        """A figure built from the inputs named in `needs`, independently of the other figures."""
+        self._figures[name] = (builder, needs)
+        return self
+
+    def run(self, threads=RENDER_THREADS):
+        """{figure name: figure} in declaration order."""
+        values, timings = self.values, []
+        for name, (builder, needs) in self._inputs.items():
+            values[name], elapsed = _timed(builder, [values[need] for need in needs])
+            timings.append((name, "input", elapsed))
+
+        jobs = [(builder, [values[need] for need in needs]) for builder, needs in self._figures.values()]
+        if threads < 2 or len(jobs) < 2:
+            results = [_timed(builder, args) for builder, args in jobs]
+        else:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+            ctx = get_script_run_ctx()
+
+            def build(builder, args):
+                # cached helpers called by a builder look up the session through the context
+                add_script_run_ctx(threading.current_thread(), ctx)
+                return _timed(builder, args)
+
+            futures = [_executor().submit(build, builder, args) for builder, args in jobs]
+            results = [future.result() for future in futures]
+
+        figures = {}
+        for name, (figure, elapsed) in zip(self._figures, results):
+            figures[name] = figure
+            timings.append((name, "figure", elapsed))
+        self._record(timings)
+        return figures
+
+    def _record(self, timings):
+        inputs = sum(elapsed for _, kind, elapsed in timings if kind == "input")
+        slowest = max((step for step in timings if step[1] == "figure"), key=lambda step: step[2], default=None)
+        st.session_state.setdefault("render_timings", {})[self.name] = timings
+        if slowest is not None:
+            logger.info("%s: inputs %.1f ms, critical figure %s %.1f ms", self.name, inputs * 1000,
+                        slowest[0], slowest[2] * 1000)
+
+
+def render_report():
+    """Per-step build times of the session's last render of each plan, critical figure marked."""
+    rows = []
+    for plan, timings in st.session_state.get("render_timings", {}).items():
+        slowest = max((elapsed for _, kind, elapsed in timings if kind == "figure"), default=None)
+        rows += [{"Plan": plan, "Step": name, "Kind": kind, "Build (ms)": round(elapsed * 1000, 1),
+                  "Critical": kind == "figure" and elapsed == slowest} for name, kind, elapsed in timings]
+    return pd.DataFrame(rows, columns=["Plan", "Step", "Kind", "Build (ms)", "Critical"])
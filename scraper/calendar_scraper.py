@@ -1,11 +1,29 @@
+import hashlib
+import os
+import re
+
 import pandas as pd
 from bs4 import BeautifulSoup
 import requests
 
+from const import CACHE_DIR
+
+CALENDAR_URL = "https://www.controlrisks.com/our-thinking/geopolitical-calendar"
+# every event ever scraped, keyed by (date, event, location)
+CALENDAR_ARCHIVE = os.path.join(CACHE_DIR, "calendar_archive.arrow")
+ARCHIVE_DTYPES = {"Key": "string[pyarrow]", "Date": "datetime64[ns]", "Date Text": "string[pyarrow]",
+                  "Event": "string[pyarrow]", "Location": "string[pyarrow]", "Flag": "string[pyarrow]",
+                  "First Seen": "datetime64[ns]", "Last Seen": "datetime64[ns]"}
+
+# "14 October 2026", "14-16 Oct 2026", "30 Sep - 2 Oct 2026", "October 2026"
+_DAY_MONTH = re.compile(r"(\d{1,2})\s*(?:[-–]\s*\d{1,2}\s*)?([A-Za-z]{3,})")
+_MONTH = re.compile(r"([A-Za-z]{3,})")
+_YEAR = re.compile(r"\b(\d{4})\b")
+
 
 def fetch_page(url):
     """Fetch the content of a webpage."""
-    response = requests.get(url)
+    response = requests.get(url, timeout=30)
     if response.status_code == 200:
         return response.content
     else:
@@ -13,7 +31,7 @@ def fetch_page(url):
 
 
 def parse_table(html_content):
-    """Parse the table from the HTML content and return the data."""
+    """Parse the calendar table into plain Date, Event, Location and Flag (image URL) fields."""
     soup = BeautifulSoup(html_content, 'html.parser')
     data = []
     table = soup.find('table')
@@ -21,35 +39,121 @@ def parse_table(html_content):
         cells = row.find_all('td')  # Find all <td> elements within the row
         if len(cells) == 4:  # Ensure there are at least 4 columns as per your example
             date = cells[0].text.strip()
-            event = f"<h4>{cells[1].text.strip()}</h4>"
+            event = cells[1].text.strip()
             location = cells[2].text.strip()
-            # The image URL is in the fourth <td> (index 3)
+            # The flag image URL is in the fourth <td> (index 3)
             img_tag = cells[3].find('img')
-            img = "<img src='./' width='30' height='30' style='vertical-align:middle;'>"
+            flag = None
             if img_tag and 'src' in img_tag.attrs:
-                img_url = img_tag['src']
-                if not img_url.startswith('http'):
-                    img_url = 'https://www.controlrisks.com' + img_url  # Complete the URL if needed
-                # Combine location and image tag in HTML format
-                img = f"<img src='{img_url}' width='30' height='30' style='vertical-align:middle;'>"
-            else:
-                location_with_img = location  # No image found, use location text only
-
-            data.append([date, event, location, img])
+                flag = img_tag['src']
+                if not flag.startswith('http'):
+                    flag = 'https://www.controlrisks.com' + flag  # Complete the URL if needed
+
+            data.append([date, event, location, flag])
         elif len(cells) == 1:  # Info row, add to the previous row's event
             info = cells[0].text.strip()
             if data:
                 data[-1][1] += " " + info
     return data
 
-def create_dataframe(data, columns):
-    """Create a DataFrame from the data."""
-    return pd.DataFrame(data, columns=columns)
+
+def parse_event_date(text):
+    """First day of a published date or date range; NaT when it names no month and year."""
+    year = _YEAR.search(text)
+    if year is None:
+        return pd.NaT
+    day_month = _DAY_MONTH.search(text)
+    if day_month is not None:
+        day, month = day_month.groups()
+    else:
+        month = _MONTH.search(text)
+        day, month = "1", month.group(1) if month else None
+    if month is None:
+        return pd.NaT
+    return pd.to_datetime(f"{day} {month[:3]} {year.group(1)}", format="%d %b %Y", errors="coerce")
+
+
+def create_dataframe(data):
+    """
+    Structured calendar: the parsed start `Date` next to the date as published (`Date Text`),
+    plain-text Event and Location, and the Flag image URL, with Arrow-backed string columns.
+    """
+    df = pd.DataFrame(data, columns=["Date Text", "Event", "Location", "Flag"]).astype("string[pyarrow]")
+    df.insert(0, "Date", pd.to_datetime(df["Date Text"].map(parse_event_date, na_action="ignore")))
+    return df
 
 
-def get_geopolitical_calendar():
-    url = "https://www.controlrisks.com/our-thinking/geopolitical-calendar"
+def get_geopolitical_calendar(url=CALENDAR_URL):
     html_content = fetch_page(url)
     data = parse_table(html_content)
-    df = create_dataframe(data, ['Date', 'Event', 'Location', ' '])
-    return df
+    return create_dataframe(data)
+
+
+# in-process copy of the archive, reloaded only when the file changes
+_archive_cache = {"mtime": None, "df": None}
+
+
+def event_keys(calendar):
+    """Stable key per event: its parsed date (the published text when undated), event and location."""
+    dates = calendar["Date"].dt.strftime("%Y-%m-%d").fillna(calendar["Date Text"].fillna(""))
+    parts = dates + "|" + calendar["Event"].fillna("") + "|" + calendar["Location"].fillna("")
+    return parts.map(lambda part: hashlib.sha1(part.encode()).hexdigest()).astype("string[pyarrow]")
+
+
+def load_archive(store=CALENDAR_ARCHIVE):
+    """All archived events, sorted by date (undated last)."""
+    import pyarrow as pa
+
+    try:
+        mtime = os.path.getmtime(store)
+    except OSError:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in ARCHIVE_DTYPES.items()})
+
+    if _archive_cache["mtime"] != (store, mtime):
+        table = pa.ipc.open_file(pa.memory_map(store)).read_all()
+        df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+        _archive_cache.update(mtime=(store, mtime), df=df)
+    return _archive_cache["df"]
+
+
+def upsert_events(calendar, seen_at, store=CALENDAR_ARCHIVE):
+    """
+    Merge a scraped calendar into the archive: new events are added, known ones get their
+    flag and `Last Seen` updated. Returns the number of new events.
+    """
+    import pyarrow as pa
+
+    calendar = calendar.assign(Key=event_keys(calendar)).drop_duplicates("Key", keep="last")
+    archive = load_archive(store)
+    known = archive["Key"].isin(calendar["Key"])
+    new = calendar[~calendar["Key"].isin(archive["Key"])].assign(**{"First Seen": seen_at})
+    seen = calendar[calendar["Key"].isin(archive["Key"])].set_index("Key")
+
+    archive = archive.assign(Flag=archive["Key"].map(seen["Flag"]).where(known, archive["Flag"]),
+                             **{"Last Seen": archive["Last Seen"].mask(known, seen_at)})
+    new = new.assign(**{"Last Seen": seen_at})[list(ARCHIVE_DTYPES)]
+    merged = pd.concat([archive, new], ignore_index=True) if len(archive) else new
+    merged = merged.astype(ARCHIVE_DTYPES).sort_values(["Date", "Location", "Event"], na_position="last",
+                                                       kind="stable", ignore_index=True)
+
+    os.makedirs(os.path.dirname(store), exist_ok=True)
+    table = pa.Table.from_pandas(merged, preserve_index=False)
+    tmp_path = f"{store}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, store)
+    return len(new)
+
+
+def update_calendar_archive(url=CALENDAR_URL, store=CALENDAR_ARCHIVE):
+    """Scrape the calendar into the archive and return the whole archive."""
+    upsert_events(get_geopolitical_calendar(url), pd.Timestamp.now().floor("s"), store)
+    return load_archive(store)
+
+
+def latest_archive(store=CALENDAR_ARCHIVE):
+    """The archive and when it was last updated, without the network; (None, None) if there is none."""
+    archive = load_archive(store)
+    if archive.empty:
+        return None, None
+    return archive, archive["Last Seen"].max()
@@ -1,3 +1,5 @@
+from io import StringIO
+
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
@@ -15,26 +17,19 @@ def get_table(soup, table_id):
 
 
 def get_table_data(table):
-    columns = []
-    data = []
-    header_row = table.find('tr', class_='row-1')
-    for th in header_row.find_all('th'):
-        columns.append(th.text.strip())
-    rows = table.find_all('tr')[1:]
-    for row in rows:
-        row_data = []
-        for td in row.find_all('td'):
-            row_data.append(td.text.strip())
-        data.append(row_data)
-    df = pd.DataFrame(data, columns=columns)
+    # let lxml parse the whole table in one pass instead of walking every cell
+    df = pd.read_html(StringIO(str(table)), flavor="lxml", header=0)[0]
+    df.columns = df.columns.astype(str).str.strip()
     return df
 
 
 def preprocess_data(df):
-    for i in df.columns:
-        if "FT" in i:
-            df[i] = df[i].str.replace(',', '').str.replace('$', '').astype(int)
-    df["Port"] = df["Origin Country (Port/City)"].apply(lambda x:x.split(" (")[0])
+    size_cols = [i for i in df.columns if "FT" in i]
+    df[size_cols] = df[size_cols].astype(str).replace(r"[$,]", "", regex=True) \
+        .apply(pd.to_numeric, errors="coerce")
+    origin = df["Origin Country (Port/City)"].astype(str).str.extract(r"^(?P<Port>[^(]+?)\s*(?:\((?P<City>[^)]*)\))?\s*$")
+    df["Port"] = origin["Port"]
+    df["City"] = origin["City"]
     return df
 
 
@@ -44,4 +39,3 @@ def scrap_data(url):
     df = get_table_data(table)
     df = preprocess_data(df)
     return df
-
@@ -1,7 +1,24 @@
+import hashlib
+import json
+import os
+
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 
+from const import CACHE_DIR
+
+WCI_URL = "https://moverdb.com/container-shipping/"
+WCI_STORE = os.path.join(CACHE_DIR, "wci_history.csv")
+# how long a stored snapshot is served before the page is checked again
+SNAPSHOT_MAX_AGE = pd.Timedelta(hours=12)
+# wait before retrying after a failed scrape
+RETRY_AFTER = pd.Timedelta(minutes=15)
+
+# in-process copy of the store, reloaded only when the file changes
+_history_cache = {"mtime": None, "df": None}
+
+
 def fetch_html(url):
     """
     Fetch HTML content from the given URL.
@@ -37,22 +54,129 @@ def parse_table(html_content):
     return headers, rows
 
 
+def snapshot_hash(headers, rows):
+    """
+    Content hash of a scraped table, used to skip storing unchanged snapshots.
+    """
+    return hashlib.sha256(json.dumps([headers, rows]).encode()).hexdigest()
 
-def get_wci_data():
-    url = "https://moverdb.com/container-shipping/"
 
+def _meta_path(store):
+    return os.path.splitext(store)[0] + ".meta.json"
+
+
+def _read_meta(store):
     try:
-        # Fetch HTML content
-        html_content = fetch_html(url)
+        with open(_meta_path(store)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(store, meta):
+    with open(_meta_path(store), "w") as f:
+        json.dump(meta, f)
+
+
+def load_wci_history(store=WCI_STORE):
+    """
+    All stored snapshots in long format: one row per table row, tagged with
+    `Scraped At` and `Snapshot Hash`.
+    """
+    try:
+        mtime = os.path.getmtime(store)
+    except OSError:
+        return pd.DataFrame(columns=["Scraped At", "Snapshot Hash"])
+
+    if _history_cache["mtime"] != (store, mtime):
+        df = pd.read_csv(store, dtype=str)
+        df["Scraped At"] = pd.to_datetime(df["Scraped At"])
+        _history_cache.update(mtime=(store, mtime), df=df)
+    return _history_cache["df"]
+
+
+def append_snapshot(headers, rows, scraped_at, store=WCI_STORE):
+    """
+    Append a scraped table to the store unless it matches the latest stored snapshot.
+    Returns True when a new snapshot was written.
+    """
+    meta = _read_meta(store)
+    meta["last_checked"] = scraped_at.isoformat()
+    content_hash = snapshot_hash(headers, rows)
+    if content_hash == meta.get("last_hash"):
+        _write_meta(store, meta)
+        return False
+
+    snapshot = pd.DataFrame(rows, columns=headers)
+    snapshot.insert(0, "Snapshot Hash", content_hash)
+    snapshot.insert(0, "Scraped At", scraped_at.isoformat())
+
+    history = load_wci_history(store)
+    if len(history) and list(history.columns) != list(snapshot.columns):
+        # the source table changed shape, rewrite the store with the union of columns
+        history = history.assign(**{"Scraped At": history["Scraped At"].map(pd.Timestamp.isoformat)})
+        pd.concat([history, snapshot], ignore_index=True).to_csv(store, index=False)
+    else:
+        snapshot.to_csv(store, mode="a", header=not os.path.exists(store), index=False)
+
+    meta["last_hash"] = content_hash
+    _write_meta(store, meta)
+    return True
 
-        # Parse HTML and extract table data
+
+def update_wci_history(url=WCI_URL, store=WCI_STORE, max_age=SNAPSHOT_MAX_AGE):
+    """
+    Scrape the WCI table only if the store was last checked more than `max_age` ago.
+    """
+    meta = _read_meta(store)
+    now = pd.Timestamp.now()
+    if "last_checked" in meta and now - pd.Timestamp(meta["last_checked"]) < max_age:
+        return False
+    if "last_failed" in meta and now - pd.Timestamp(meta["last_failed"]) < RETRY_AFTER:
+        return False
+
+    os.makedirs(os.path.dirname(store), exist_ok=True)
+    try:
+        html_content = fetch_html(url)
         headers, rows = parse_table(html_content)
+    except Exception:
+        meta["last_failed"] = now.isoformat()
+        _write_meta(store, meta)
+        raise
+    meta.pop("last_failed", None)
+    _write_meta(store, meta)
+    return append_snapshot(headers, rows, now, store)
+
+
+def get_wci_history(start=None, end=None, store=WCI_STORE):
+    """
+    Stored snapshots scraped within [start, end], read from disk.
+    """
+    history = load_wci_history(store)
+    if start is not None:
+        history = history[history["Scraped At"] >= pd.Timestamp(start)]
+    if end is not None:
+        history = history[history["Scraped At"] <= pd.Timestamp(end)]
+    return history
 
-        # Create DataFrame
-        df = pd.DataFrame(rows, columns=headers)
 
-        return df
+def latest_wci_data(store=WCI_STORE):
+    """
+    Latest stored snapshot, in the shape of the scraped table, and when the page was last
+    checked; (None, None) when nothing is stored. Doesn't touch the network.
+    """
+    history = load_wci_history(store)
+    if history.empty:
+        return None, None
+    latest = history[history["Scraped At"] == history["Scraped At"].max()]
+    checked = _read_meta(store).get("last_checked")
+    latest_table = latest.drop(columns=["Scraped At", "Snapshot Hash"]).dropna(axis=1, how="all").reset_index(drop=True)
+    return latest_table, pd.Timestamp(checked) if checked else latest["Scraped At"].iloc[0]
+
 
+def get_wci_data():
+    try:
+        update_wci_history()
     except Exception as e:
         print(f"An error occurred: {e}")
-        return None
\ No newline at end of file
+    return latest_wci_data()[0]
@@ -0,0 +1,77 @@
+"""
+Shipping route costs from the moverdb `tablepress-29` table.
+
+The table is scraped and parsed once into an origin × container-size matrix. Cost
+lookups for whole inventories are joins against that matrix.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+# page hosting the tablepress-29 shipping cost table
+SHIPPING_COSTS_URL = os.environ.get("SHIPPING_COSTS_URL", "https://moverdb.com/container-shipping/")
+
+
+def fetch_shipping_costs(url=SHIPPING_COSTS_URL):
+    """Cost matrix scraped from `url`; raises when the table can't be fetched."""
+    from scraper.scrape import scrap_data
+
+    return cost_matrix(scrap_data(url))
+
+
+def container_size_ft(sizes):
+    """Leading container length in feet, e.g. "40' HC" or "40 FT" -> 40."""
+    sizes = pd.Series(sizes)
+    return pd.to_numeric(sizes.astype(str).str.extract(r"(\d+)", expand=False), errors="coerce").astype("Int64")
+
+
+def cost_matrix(table: pd.DataFrame):
+    """Shipping cost in USD indexed by origin (Port, City) with one column per container size in feet."""
+    size_cols = [col for col in table.columns if "FT" in col]
+    matrix = table.set_index(["Port", "City"])[size_cols].astype(float)
+    matrix.columns = pd.Index(container_size_ft(size_cols).to_numpy(), name="Size FT")
+    return matrix[~matrix.index.duplicated()]
+
+
+def _normalize(names):
+    return pd.Series(names).astype(str).str.strip().str.lower().to_numpy()
+
+
+def route_costs(matrix: pd.DataFrame):
+    """Long (origin name, size) -> cost series; city names take precedence over the country row."""
+    long = matrix.stack().rename("Shipping Cost").reset_index()
+    by_city = long.dropna(subset=["City"]).assign(Origin=lambda df: _normalize(df["City"]))
+    by_port = long.assign(Origin=_normalize(long["Port"]))
+    routes = pd.concat([by_city, by_port], ignore_index=True).drop_duplicates(subset=["Origin", "Size FT"])
+    return routes.set_index(["Origin", "Size FT"])["Shipping Cost"]
+
+
+def lookup_costs(matrix: pd.DataFrame, origins, sizes):
+    """Shipping cost for every (origin, size) pair at once, NaN where the route is not quoted."""
+    keys = pd.MultiIndex.from_arrays([_normalize(origins), container_size_ft(sizes).to_numpy()],
+                                     names=["Origin", "Size FT"])
+    return route_costs(matrix).reindex(keys).to_numpy()
+
+
+def landed_costs(inventory: pd.DataFrame, locations_map: dict, matrix: pd.DataFrame):
+    """Inventory with per-unit `Shipping Cost` and `Landed Cost` (purchase + shipping) columns."""
+    location_names = inventory["Location"].map(locations_map).fillna(inventory["Location"])
+    shipping_cost = lookup_costs(matrix, location_names, inventory["Size"])
+    return inventory.assign(**{"Location Name": location_names.to_numpy(),
+                               "Shipping Cost": shipping_cost,
+                               "Landed Cost": inventory["Purchase Cost"].to_numpy() + shipping_cost})
+
+
+@st.cache_data(show_spinner=False)
+def inventory_landed_costs(_inventory, inventory_version, _locations_map, locations_version, matrix):
+    return landed_costs(_inventory, _locations_map, matrix)
+
+
+def landed_cost_summary(landed: pd.DataFrame):
+    """Mean landed cost per unit by location and container size, for units with a quoted route."""
+    quoted = landed.dropna(subset=["Shipping Cost"])
+    summary = quoted.groupby(["Location Name", container_size_ft(quoted["Size"]).rename("Size FT").to_numpy()]) \
+        .agg(**{"Units": ("Landed Cost", "size"), "Landed Cost": ("Landed Cost", "mean")})
+    summary.index.names = ["Location Name", "Size FT"]
+    return summary.reset_index()
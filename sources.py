@@ -0,0 +1,205 @@
+"""
+Slow external sources (market quotes, scraped tables) served stale-while-revalidate.
+
+A page asks for its sources up front: those older than their `max_age` are refetched
+concurrently on a process-wide thread pool, while every section is drawn at once from the
+last value kept in memory or on disk, with its timestamp. `stream` then redraws each
+section as its fetch lands, so the page is usable as soon as the fastest source is back
+instead of after all of them. A fetch already in flight is shared by every session that
+asks for the same source.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import streamlit as st
+
+from const import CACHE_DIR
+
+SOURCE_STORE = os.path.join(CACHE_DIR, "sources")
+# fetches wait on the network, not the CPU
+FETCH_THREADS = int(os.environ.get("SOURCE_FETCH_THREADS", "8"))
+# wait before refetching a source whose last fetch failed
+RETRY_AFTER = 300
+# longest a page waits for its fetches; slower ones keep their stale value until the next rerun
+STREAM_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+_pool = {"executor": None}
+# per source name: last value and fetch time, in-flight future, last failure time
+_state = {}
+_lock = threading.Lock()
+
+
+def _executor():
+    if _pool["executor"] is None:
+        _pool["executor"] = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="fetch")
+    return _pool["executor"]
+
+
+class Source:
+    """
+    A named external value. `fetch()` gets it from the network; it is kept in memory and,
+    for frames and Arrow tables, in the source store for the next start. A source with its
+    own on-disk history passes `stored`, returning (value, fetched at) without the network.
+    """
+
+    def __init__(self, name, fetch, max_age, stored=None, label=None):
+        self.name = name
+        self.label = label or name.replace("_", " ").title()
+        self.fetch = fetch
+        self.max_age = max_age
+        self.stored = stored
+
+    def _path(self, store):
+        return os.path.join(store, f"{self.name}.arrow")
+
+    def _save(self, value, fetched_at, store=SOURCE_STORE):
+        import pyarrow as pa
+
+        if self.stored is not None:
+            return
+        try:
+            table = value if isinstance(value, pa.Table) else pa.Table.from_pandas(value)
+        except (TypeError, pa.ArrowInvalid, pa.ArrowTypeError):
+            return
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b"fetched_at": fetched_at.isoformat().encode()})
+        os.makedirs(store, exist_ok=True)
+        path = self._path(store)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def _load(self, store=SOURCE_STORE):
+        """(value, fetched at) from disk, or (None, None)."""
+        import pyarrow as pa
+
+        if self.stored is not None:
+            return self.stored()
+        try:
+            table = pa.ipc.open_file(pa.memory_map(self._path(store))).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None, None
+        metadata = table.schema.metadata or {}
+        fetched_at = pd.Timestamp(metadata[b"fetched_at"].decode()) if b"fetched_at" in metadata else None
+        # frames were stored with their pandas metadata, Arrow tables without
+        return (table.to_pandas() if b"pandas" in metadata else table), fetched_at
+
+
+def latest(source):
+    """(value, fetched at) of the last fetch, from memory or disk; (None, None) if there was none."""
+    with _lock:
+        state = _state.setdefault(source.name, {})
+        if "value" in state:
+            return state["value"], state["fetched_at"]
+    value, fetched_at = source._load()
+    with _lock:
+        # a fetch may have landed meanwhile
+        if "value" not in state:
+            state["value"], state["fetched_at"] = value, fetched_at
+        return state["value"], state["fetched_at"]
+
+
+def _fetch(source):
+    try:
+        value = source.fetch()
+    except Exception:
+        with _lock:
+            _state[source.name]["failed_at"] = time.monotonic()
+        raise
+    fetched_at = pd.Timestamp.now()
+    try:
+        source._save(value, fetched_at)
+    except OSError:
+        logger.warning("couldn't store %s", source.name, exc_info=True)
+    with _lock:
+        _state[source.name].update(value=value, fetched_at=fetched_at)
+    return value, fetched_at
+
+
+def revalidate(source):
+    """The in-flight fetch of `source`, starting one if its value is older than `max_age`; None when fresh."""
+    value, fetched_at = latest(source)
+    with _lock:
+        state = _state[source.name]
+        future = state.get("future")
+        if future is not None and not future.done():
+            return future
+        if value is not None and fetched_at is not None and \
+                pd.Timestamp.now() - fetched_at < pd.Timedelta(seconds=source.max_age):
+            return None
+        if time.monotonic() - state.get("failed_at", -RETRY_AFTER) < RETRY_AFTER:
+            return None
+        state["future"] = _executor().submit(_fetch, source)
+        return state["future"]
+
+
+def _caption(fetched_at, refreshing=False, failed=False):
+    if fetched_at is None:
+        return "Loading…" if refreshing else ""
+    text = f"As of {fetched_at:%b %d %H:%M}"
+    if refreshing:
+        text += " · refreshing…"
+    elif failed:
+        text += " · refresh failed, showing the last data"
+    return text
+
+
+def place(sections):
+    """
+    Draw each section from its last value and return what is still being fetched, for `fill`.
+
+    `sections` is a list of (source, container, draw); `draw(container, value, final)` is
+    called with the value to show, and `final` is False for a stale value that is being
+    refreshed (widgets should only be created when it is True, since a section can be
+    drawn twice in one run). Fetches start before anything is drawn.
+    """
+    futures = [revalidate(source) for source, _, _ in sections]
+    pending = []
+    for (source, container, draw), future in zip(sections, futures):
+        placeholder = container.empty()
+        value, fetched_at = latest(source)
+        with placeholder.container():
+            st.caption(_caption(fetched_at, refreshing=future is not None))
+            if value is not None:
+                draw(st, value, final=future is None)
+            elif future is None:
+                # the last fetch failed and there is nothing to fall back on
+                st.warning(f"{source.label} data not available.")
+        if future is not None:
+            pending.append((future, source, placeholder, draw))
+    return pending
+
+
+def fill(pending, timeout=STREAM_TIMEOUT):
+    """Redraw the sections returned by `place` as their fetches land, fastest first."""
+    by_future = {}
+    for future, source, placeholder, draw in pending:
+        by_future.setdefault(future, []).append((source, placeholder, draw))
+    deadline = time.monotonic() + timeout
+    while by_future:
+        done, _ = wait(by_future, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            for source, placeholder, draw in by_future.pop(future):
+                if future.exception() is not None:
+                    logger.warning("fetching %s failed: %s", source.name, future.exception())
+                value, fetched_at = latest(source)
+                with placeholder.container():
+                    st.caption(_caption(fetched_at, failed=future.exception() is not None))
+                    if value is not None:
+                        draw(st, value, final=True)
+                    else:
+                        st.warning(f"{source.label} data not available.")
+
+
+def stream(sections, timeout=STREAM_TIMEOUT):
+    """Draw each section from its last value at once, then redraw it as its fetch lands."""
+    fill(place(sections), timeout)
@@ -0,0 +1,110 @@
+"""
+Commodity symbol registry.
+
+`const.Commodities` lists the Macro tab's symbols by group. The registry gives each symbol
+to the first group listing it, so a symbol is fetched once (RB=F is RBOB gasoline, not
+rubber), and keeps per-symbol health in a JSON file: last success, consecutive failures
+and last attempt. A symbol that keeps returning no data is skipped for a backoff that
+doubles with every failure, up to a week, then tried again, so dead tickers stop costing
+a round trip without being dropped for good.
+"""
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from const import CACHE_DIR, Commodities
+
+HEALTH_PATH = os.path.join(CACHE_DIR, "symbol_health.json")
+# seconds a symbol is skipped after its first failure, doubled with each further one
+BACKOFF = 3600
+MAX_BACKOFF = 7 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_memory = {"registry": None, "health": None}
+
+
+def registry():
+    """{group: {name: symbol}} with every symbol in the first group that lists it."""
+    if _memory["registry"] is None:
+        seen, groups = {}, {}
+        for group in Commodities:
+            groups[group.name] = {}
+            for name, symbol in group.value.items():
+                if symbol in seen:
+                    logger.info("%s (%s) is already listed as %s, skipped", name, symbol, seen[symbol])
+                    continue
+                seen[symbol] = f"{group.name}/{name}"
+                groups[group.name][name] = symbol
+        _memory["registry"] = groups
+    return _memory["registry"]
+
+
+def _load_health(path=HEALTH_PATH):
+    if _memory["health"] is None:
+        try:
+            with open(path) as f:
+                _memory["health"] = json.load(f)
+        except (OSError, ValueError):
+            _memory["health"] = {}
+    return _memory["health"]
+
+
+def _save_health(health, path=HEALTH_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(health, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def retry_at(state):
+    """When a symbol with this health record is tried again; None when it isn't backing off."""
+    if not state.get("failures"):
+        return None
+    backoff = min(BACKOFF * 2 ** (state["failures"] - 1), MAX_BACKOFF)
+    return pd.Timestamp(state["last_attempt"]) + pd.Timedelta(seconds=backoff)
+
+
+def due(group, now=None):
+    """{name: symbol} of `group` to fetch now, leaving out symbols that are backing off."""
+    now = now or pd.Timestamp.now()
+    with _lock:
+        health = _load_health()
+        return {name: symbol for name, symbol in registry()[group].items()
+                if (retry_at(health.get(symbol, {})) or now) <= now}
+
+
+def record(results, now=None):
+    """Store the outcome of a fetch, {symbol: True when it returned data}."""
+    now = (now or pd.Timestamp.now()).isoformat()
+    with _lock:
+        health = _load_health()
+        for symbol, ok in results.items():
+            state = health.setdefault(symbol, {})
+            state["last_attempt"] = now
+            if ok:
+                state["last_success"], state["failures"] = now, 0
+            else:
+                state["failures"] = state.get("failures", 0) + 1
+                logger.info("%s returned no data (%d in a row), retried after %s", symbol, state["failures"],
+                            retry_at(state))
+        _save_health(health)
+
+
+def health_report():
+    """One row per registered symbol with its health and, for dead ones, when it is retried."""
+    with _lock:
+        health = dict(_load_health())
+    rows = []
+    for group, symbols in registry().items():
+        for name, symbol in symbols.items():
+            state = health.get(symbol, {})
+            rows.append({"Group": group, "Name": name, "Symbol": symbol,
+                         "Last Success": pd.Timestamp(state["last_success"]) if "last_success" in state else pd.NaT,
+                         "Failures": state.get("failures", 0), "Retry At": retry_at(state)})
+    return pd.DataFrame(rows)
@@ -0,0 +1,178 @@
+"""
+Table builders.
+
+Formats and colors are computed per column with NumPy, so each table costs a handful of
+array operations instead of a Python call per cell.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+def format_numbers(values, fmt="%.2f", prefix="", suffix=""):
+    values = np.asarray(values, dtype=float)
+    text = np.char.add(np.char.add(prefix, np.char.mod(fmt, values)), suffix)
+    return np.where(np.isnan(values), "", text)
+
+
+def sign_colors(values, positive, negative):
+    return np.where(np.asarray(values, dtype=float) >= 0, positive, negative)
+
+
+def striped(colors, n_rows):
+    return np.resize(np.asarray(colors), n_rows)
+
+
+def weekly_data_table(df):
+    n_rows = len(df)
+    row_colors = striped(["#2f3e46", "#354f52", "#52796f"], n_rows)
+
+    ammt = df["AMMT Market Price"].to_numpy(dtype=float)
+    avg = df["Avg Market Price"].to_numpy(dtype=float)
+    ammt_display = format_numbers(ammt, prefix="$")
+    ammt_display = np.where(ammt > avg, np.char.add("🔺 ", ammt_display), ammt_display)
+
+    columns = [
+        df["Name"].to_numpy(),
+        df["Location"].to_numpy(),
+        df["Condition"].to_numpy(),
+        df["Size"].to_numpy(),
+        df["Real Time"].to_numpy(),
+        df["On the way"].to_numpy(),
+        format_numbers(avg, prefix="$"),
+        ammt_display,
+    ]
+    white = np.full(n_rows, "white")
+    font_colors = [white] * 4 + [
+        np.where(df["Real Time"].to_numpy() == 0, "#e63946", "#52b788"),
+        np.where(df["On the way"].to_numpy() == 0, "#e63946", "#52b788"),
+        white,
+        white,
+    ]
+
+    fig = go.Figure(data=[go.Table(
+        columnwidth=[2, 2, 2, 2, 2, 2, 2, 2],
+        header=dict(
+            values=["🏷️ Name", "📍 Location", "🔍 Condition", "📏 Size", "⏳ Real Time", "🚛 On the way",
+                    "💰 Avg Market Price", "📈 AMMT Market Price"],
+            fill_color="#1b263b",
+            font=dict(family="ubuntu", color="#adb5bd", size=18, weight="bold"),
+            align="center",
+            line_color="black",
+            height=50,
+            line_width=0,
+        ),
+        cells=dict(
+            values=columns,
+            fill_color=[row_colors] * len(columns),
+            font=dict(family="ubuntu", color=font_colors, size=14, weight="bold"),
+            align="center",
+            height=45,
+            line_width=0,
+            line_color="black"
+        )
+    )])
+
+    fig.update_layout(margin=dict(l=10, r=0, t=20, b=20), height=60*(n_rows+2))
+
+    return fig
+
+
+def wci_table(df):
+    n_rows = len(df)
+    row_colors = striped(["#eff6e0", "#aec3b0"], n_rows)
+
+    values = [df[col].to_numpy() for col in df.columns]
+    if "Annual change (%)" in df.columns:
+        change = df["Annual change (%)"].to_numpy(dtype=str)
+        position = df.columns.get_loc("Annual change (%)")
+        values[position] = np.where(np.char.startswith(change, "Down"),
+                                    np.char.add("🔻", change), np.char.add("📈", change))
+
+    fig = go.Figure(data=[go.Table(
+        columnwidth=[2] * len(df.columns),
+        header=dict(
+            values=list(df.columns),
+            fill_color="#124559",
+            font=dict(family="ubuntu", color="white", size=18, weight="bold"),
+            align="center",
+            line_color="black",
+            height=50,
+            line_width=0,
+        ),
+        cells=dict(
+            values=values,
+            fill_color=[row_colors] * len(values),
+            font=dict(family="ubuntu", color="black", size=14, weight="bold"),
+            align="center",
+            height=45,
+            line_width=0,
+            line_color="black"
+        )
+    )])
+
+    fig.update_layout(margin=dict(l=0, r=0, t=10, b=5), height=60*n_rows)
+
+    return fig
+
+
+def price_movers_table(data: pd.DataFrame, indicator, table_title):
+    """Week-on-week movers from `biggest_growth_and_drop_in_prices`, change colored with `indicator`."""
+    values = [data["City Area"].to_numpy(),
+              format_numbers(data["Market Price"], fmt="%.0f", prefix="$"),
+              format_numbers(data["Week-on-Week Change"], suffix="%")]
+
+    fig = go.Figure(data=[go.Table(
+        columnwidth=[1, 1, 1],
+        header=dict(
+            values=list(data.columns),
+            font=dict(size=18, color='white', family='ubuntu'),
+            fill_color='#264653',
+            align=['left', 'center'],
+            height=60
+        ),
+        cells=dict(
+            values=values,
+            font=dict(size=14, color=['black', 'black', indicator], family='ubuntu'),
+            fill_color='#f0efeb',
+            align=['left', 'center'],
+            height=40
+        )
+    )]
+    )
+    fig.update_layout(margin=dict(l=0, r=0, b=10, t=60), height=60 + 40*(len(data)+1),
+                      title=table_title)
+    return fig
+
+
+def price_alerts_table(alerts: pd.DataFrame):
+    z_score = alerts["Z-Score"].to_numpy(dtype=float)
+    direction = np.where(z_score >= 0, "▲ Spike", "▼ Drop")
+    values = [alerts["DATE"].dt.strftime("%d %b %Y").to_numpy(),
+              alerts["CITY"].to_numpy(),
+              format_numbers(alerts["MARKET_PRICE_USD"], fmt="%.0f", prefix="$"),
+              format_numbers(alerts["Rolling Mean"], fmt="%.0f", prefix="$"),
+              format_numbers(z_score, fmt="%+.1f"),
+              direction]
+    font_colors = ["black"] * 4 + [sign_colors(z_score, "#2a9d8f", "#e76f51")] * 2
+
+    fig = go.Figure(data=[go.Table(
+        columnwidth=[2, 2, 2, 2, 1, 2],
+        header=dict(
+            values=["Date", "City", "Price", "Rolling Mean", "Z", "Alert"],
+            font=dict(size=16, color='white', family='ubuntu'),
+            fill_color='#264653',
+            align='center',
+            height=50
+        ),
+        cells=dict(
+            values=values,
+            font=dict(size=13, color=font_colors, family='ubuntu'),
+            fill_color='#f0efeb',
+            align='center',
+            height=36
+        )
+    )])
+    fig.update_layout(margin=dict(l=0, r=0, b=10, t=60), height=70 + 36*(len(alerts)+1),
+                      title="Price Alerts")
+    return fig
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeConnection:
+    """Stand-in for a GSheets connection serving fixed worksheets."""
+
+    def __init__(self, sheets):
+        self.sheets = sheets
+
+    def read(self, worksheet=None, header=0, **kwargs):
+        return self.sheets[worksheet].copy()
+
+
+def inventory_sheet(n=40, seed=0):
+    """A Data_Sheet like the real one: five header rows, then one unit per row, one blank Status."""
+    rng = np.random.default_rng(seed)
+    gate_in = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 500, n), "D")
+    gate_out = gate_in + pd.to_timedelta(rng.integers(5, 200, n), "D")
+    sold = rng.random(n) < .5
+    status = np.where(sold, "SOLD", rng.choice(["AVLB", "PKUP"], n)).astype(object)
+    status[3] = None
+    units = pd.DataFrame({
+        "Unit #": [f"U{i}" for i in range(n)], "Location": rng.choice(["HOU", "DAL"], n),
+        "Depot": rng.choice(["D1", "D2"], n), "Size": rng.choice(["20' ST", "40' HC"], n),
+        "Condition": rng.choice(["New", "CW"], n), "Status": status,
+        "Customer": rng.choice(list("ABC"), n),
+        "Gate In": gate_in.strftime("%m/%d/%Y"), "Gate Out": np.where(sold, gate_out.strftime("%m/%d/%Y"), None),
+        "Value": [f"${v:,.2f}" for v in rng.uniform(1000, 5000, n)],
+        "Sale Price": np.where(sold, [f"${v:,.2f}" for v in rng.uniform(2000, 6000, n)], None),
+        "Repair Cost": rng.uniform(0, 300, n).round(2), "Storage Cost": rng.uniform(0, 100, n).round(2),
+        "Purchase Cost": [f"${v:,.2f}" for v in rng.uniform(1000, 4000, n)],
+        "Aging": rng.integers(0, 400, n),
+    })
+    return pd.concat([pd.DataFrame([{}] * 5), units], ignore_index=True)
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection({"Data_Sheet": inventory_sheet()})
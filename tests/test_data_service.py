@@ -0,0 +1,41 @@
+import pytest
+
+import data_service
+from data_service import RemoteDataset
+
+
+class FakeService:
+    """Serves turnover per as-of date for the current inventory version."""
+
+    def __init__(self):
+        self.inventory_version = "v1"
+
+    def get_many(self, items):
+        replies = []
+        for (name, *args), known_version in items:
+            version = self.inventory_version if name == "inventory" else (self.inventory_version,) + tuple(args)
+            replies.append((version, None if version == known_version else f"{name}{args}@{self.inventory_version}"))
+        return replies
+
+
+@pytest.fixture
+def worker_values(monkeypatch):
+    monkeypatch.setitem(data_service._worker, "values", {})
+    return data_service._worker["values"]
+
+
+def test_worker_drops_aggregates_of_older_versions(worker_values):
+    service = FakeService()
+    RemoteDataset(service).turnover("2024-06-01")
+    RemoteDataset(service).turnover("2024-06-02")
+    service.inventory_version = "v2"
+    assert RemoteDataset(service).turnover("2024-06-02") == "turnover['2024-06-02']@v2"
+    assert sorted(worker_values) == [("inventory",), ("turnover", "2024-06-02")]
+
+
+def test_worker_keeps_a_few_as_of_dates(worker_values):
+    service = FakeService()
+    for day in range(1, 11):
+        RemoteDataset(service).turnover(f"2024-06-{day:02}")
+    dates = [key[1] for key in worker_values if key[0] == "turnover"]
+    assert dates == [f"2024-06-{day:02}" for day in range(11 - data_service.MAX_VALUES_PER_ITEM, 11)]
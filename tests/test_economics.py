@@ -0,0 +1,17 @@
+import numpy as np
+
+from economics import economics_counters, unit_economics
+from utils import load_inventory
+
+
+def test_missing_status_counts_as_unsold(conn):
+    inventory = load_inventory(conn, ttl=0)
+    assert inventory["Status"].isna().any()
+    sold = (inventory["Status"] == "SOLD").to_numpy()
+    for status in [inventory["Status"], inventory["Status"].astype("string[pyarrow]")]:
+        data = inventory.assign(Status=status)
+        units = unit_economics(data)
+        assert np.isnan(units["Margin"].to_numpy()[~sold]).all()
+        counters = economics_counters(data)
+        assert counters["Units Unsold"].sum() == (~sold).sum()
+        assert counters["Units Sold"].sum() <= sold.sum()
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from frame_store import open_frame, publish
+from utils import load_inventory
+
+
+def test_published_frame_round_trips_dtypes(conn, tmp_path):
+    inventory = load_inventory(conn, ttl=0)
+    mapped = open_frame(publish("inventory", "v1", inventory, store=str(tmp_path)))
+    pd.testing.assert_series_equal(mapped.dtypes, inventory.dtypes)
+    pd.testing.assert_frame_equal(mapped, inventory)
+
+
+def test_text_columns_keep_object_semantics(conn, tmp_path):
+    inventory = load_inventory(conn, ttl=0)
+    mapped = open_frame(publish("inventory", "v1", inventory, store=str(tmp_path)))
+    assert mapped["Status"].dtype == object
+    assert (mapped["Status"] == "SOLD").to_numpy().dtype == bool
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from render import compact_figure
+
+
+def test_bars_on_a_date_axis_are_bucketed():
+    n = 5000
+    fig = go.Figure(go.Bar(x=pd.date_range("2020-01-01", periods=n, freq="h"), y=np.ones(n)))
+    bars = compact_figure(fig, point_budget=500).data[0]
+    assert len(bars.y) == 500
+    assert np.allclose(bars.y, 1)
+
+
+def test_bars_on_a_categorical_axis_are_left_alone():
+    n = 5000
+    categories = [f"Customer {i}" for i in range(n)]
+    fig = go.Figure([go.Bar(x=categories, y=np.arange(n)),
+                     go.Bar(y=categories, x=np.arange(n), orientation="h")])
+    for bars in compact_figure(fig, point_budget=500).data:
+        assert len(bars.x) == len(bars.y) == n
@@ -0,0 +1,19 @@
+import pandas as pd
+
+import dataset
+from frame_store import load_snapshot, save_snapshot
+from turnover import turnover_counters
+from utils import load_inventory
+
+
+def test_cold_start_frame_equals_fresh_load(conn, tmp_path, monkeypatch):
+    inventory = load_inventory(conn, ttl=0)
+    save_snapshot("inventory", "v1", inventory, store=str(tmp_path))
+    monkeypatch.setattr(dataset, "USE_SNAPSHOT", True)
+    monkeypatch.setattr(dataset, "load_snapshot", lambda name: load_snapshot(name, store=str(tmp_path)))
+    monkeypatch.setattr(dataset, "start_background_refresh", lambda *args: None)
+
+    version, cold = dataset.Dataset(conn)._from_snapshot("inventory")
+    assert version == "v1"
+    pd.testing.assert_frame_equal(cold, inventory)
+    pd.testing.assert_frame_equal(turnover_counters(cold, "2024-06-30"), turnover_counters(inventory, "2024-06-30"))
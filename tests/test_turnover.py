@@ -0,0 +1,12 @@
+from turnover import turnover_counters
+from utils import load_inventory
+
+
+def test_missing_status_counts_as_unsold(conn):
+    inventory = load_inventory(conn, ttl=0)
+    assert inventory["Status"].isna().any()
+    for status in [inventory["Status"], inventory["Status"].astype("string[pyarrow]")]:
+        counters = turnover_counters(inventory.assign(Status=status), "2024-06-30")
+        assert counters["Units"].sum() == len(inventory)
+        assert counters["Sold"].sum() == (inventory["Status"] == "SOLD").sum()
+        assert counters["Unsold"].sum() == len(inventory) - counters["Sold"].sum()
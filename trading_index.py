@@ -0,0 +1,165 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+TRADING_KEYS = ["CITY", "CONTAINER_TYPE", "CONTAINER_CONDITION"]
+_NAT = np.iinfo(np.int64).min
+# versions are unique within the process, so consumers can't mistake one index for another
+_versions = itertools.count(1)
+
+
+class TradingIndex:
+    """
+    Trading prices kept sorted by (CITY, CONTAINER_TYPE, CONTAINER_CONDITION, DATE).
+
+    Every (CITY, CONTAINER_TYPE, CONTAINER_CONDITION) series is a contiguous block of
+    rows with ascending dates, so equality filters resolve to a set of blocks and date
+    ranges to a binary search inside each block.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        self.frame = _sort_trading_data(data)
+        self._build_groups()
+        # bumped on every change; `changes` describes the last append for incremental consumers
+        self.version = next(_versions)
+        self.changes = None
+
+    @classmethod
+    def from_sorted(cls, frame: pd.DataFrame):
+        """Index over a frame already in index order (e.g. a published snapshot), used as is."""
+        index = cls.__new__(cls)
+        index.frame = frame
+        index._build_groups()
+        index.version = next(_versions)
+        index.changes = None
+        return index
+
+    def _build_groups(self):
+        n = len(self.frame)
+        group_ids = self.frame.groupby(TRADING_KEYS, sort=False, dropna=False).ngroup().to_numpy()
+        change = np.ones(n, dtype=bool)
+        change[1:] = group_ids[1:] != group_ids[:-1]
+
+        self.starts = np.flatnonzero(change)
+        self.stops = np.append(self.starts[1:], n)
+        self.groups = pd.MultiIndex.from_frame(self.frame[TRADING_KEYS].iloc[self.starts])
+        self.dates = _date_values(self.frame["DATE"])
+
+    @property
+    def min_date(self):
+        # NaT sorts to the front of each block, so skip past it before taking the first date
+        first = [lo + np.searchsorted(self.dates[lo:hi], _NAT, side="right")
+                 for lo, hi in zip(self.starts, self.stops)]
+        first = [self.dates[i] for i, hi in zip(first, self.stops) if i < hi]
+        return pd.Timestamp(min(first)) if first else pd.NaT
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.dates[self.stops - 1].max()) if len(self.stops) else pd.NaT
+
+    def unique(self, column):
+        return self.groups.get_level_values(column).dropna().unique()
+
+    def positions(self, city=None, container_type=None, condition=None, start=None, end=None):
+        """Row positions in `frame` matching the key equalities and the inclusive date range."""
+        block_mask = np.ones(len(self.groups), dtype=bool)
+        for column, value in zip(TRADING_KEYS, (city, container_type, condition)):
+            if value is not None:
+                block_mask &= self.groups.get_level_values(column) == value
+
+        blocks = np.flatnonzero(block_mask)
+        if len(blocks) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        starts, stops = self.starts[blocks].copy(), self.stops[blocks].copy()
+        if start is not None or end is not None:
+            for i, (lo, hi) in enumerate(zip(self.starts[blocks], self.stops[blocks])):
+                block_dates = self.dates[lo:hi]
+                if start is not None:
+                    starts[i] = lo + np.searchsorted(block_dates, pd.Timestamp(start).value, side="left")
+                if end is not None:
+                    stops[i] = lo + np.searchsorted(block_dates, pd.Timestamp(end).value, side="right")
+            stops = np.maximum(stops, starts)
+
+        lengths = stops - starts
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def select(self, city=None, container_type=None, condition=None, start=None, end=None):
+        rows = self.positions(city, container_type, condition, start, end)
+        return self.frame.iloc[rows]
+
+    def append(self, rows: pd.DataFrame):
+        """
+        Merge new observations into the sorted frame.
+        Rows belonging to known series are spliced into place by binary search; a new
+        series falls back to a full rebuild.
+        """
+        if rows.empty:
+            return self
+        rows = _sort_trading_data(rows)
+        row_keys = pd.MultiIndex.from_frame(rows[TRADING_KEYS])
+        block_ids = self.groups.get_indexer(row_keys)
+        if (block_ids < 0).any() or not self.groups.is_unique:
+            self.__init__(pd.concat([self.frame, rows], ignore_index=True))
+            return self
+
+        row_dates = _date_values(rows["DATE"])
+        insert_at = np.empty(len(rows), dtype=np.int64)
+        for block in np.unique(block_ids):
+            members = np.flatnonzero(block_ids == block)
+            lo, hi = self.starts[block], self.stops[block]
+            insert_at[members] = lo + np.searchsorted(self.dates[lo:hi], row_dates[members], side="right")
+
+        n = len(self.frame)
+        order = np.insert(np.arange(n), insert_at, np.arange(n, n + len(rows)))
+        self.frame = pd.concat([self.frame, rows], ignore_index=True).iloc[order].reset_index(drop=True)
+        self.dates = np.insert(self.dates, insert_at, row_dates)
+
+        added = np.bincount(block_ids, minlength=len(self.groups))
+        sizes = self.stops - self.starts + added
+        self.stops = np.cumsum(sizes)
+        self.starts = self.stops - sizes
+
+        # first new row of every touched block, in the new row positions
+        new_positions = np.flatnonzero(order >= n)
+        new_blocks = block_ids[order[new_positions] - n]
+        dirty_blocks, first = np.unique(new_blocks, return_index=True)
+        self.changes = {"base_version": self.version, "order": order, "n_old": n,
+                        "dirty_blocks": dirty_blocks, "dirty_from": new_positions[first]}
+        self.version = next(_versions)
+        return self
+
+    def refresh(self, data: pd.DataFrame):
+        """
+        Bring the index up to date with a freshly read trading sheet.
+        When the indexed rows are unchanged and the sheet only gained rows dated after them,
+        those rows are appended; any other change (a corrected price, a removed row) rebuilds.
+        """
+        last_date = self.max_date
+        if pd.isna(last_date) or len(data) < len(self.frame):
+            self.__init__(data)
+            return self
+
+        new_rows = data[data["DATE"] > last_date]
+        old_rows = data[~(data["DATE"] > last_date)]
+        if len(old_rows) != len(self.frame) or not np.array_equal(
+                _row_hashes(_sort_trading_data(old_rows)[self.frame.columns]), _row_hashes(self.frame)):
+            self.__init__(data)
+        elif len(new_rows):
+            self.append(new_rows)
+        return self
+
+
+def _sort_trading_data(data: pd.DataFrame):
+    return data.sort_values(by=TRADING_KEYS + ["DATE"], na_position="first", kind="mergesort") \
+        .reset_index(drop=True)
+
+
+def _row_hashes(frame: pd.DataFrame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _date_values(dates: pd.Series):
+    return dates.to_numpy(dtype="datetime64[ns]").view(np.int64)
@@ -0,0 +1,73 @@
+"""
+Inventory turnover from Data_Sheet: aging buckets of unsold units, sell-through,
+days of inventory and capital tied up.
+
+Every unit is reduced to a row of additive counters in one vectorized pass, and the
+counters are summed per (Location, Depot, Size, Condition). Any coarser grouping is a
+second sum over that table, with the ratios derived last.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+AGING_BUCKETS = ["0–30 days", "31–90 days", "91–180 days", "180+ days"]
+AGING_EDGES = np.array([30, 90, 180])  # upper bounds (inclusive) of all but the last bucket
+SALES_WINDOW = 90  # days of sales used for the daily sell rate
+
+GROUP_COLUMNS = ["Location", "Depot", "Size", "Condition"]
+COUNTER_COLUMNS = ["Units", "Sold", "Unsold", "Recent Sold", "Capital Tied Up", "Dwell Days"] + AGING_BUCKETS
+
+
+def turnover_counters(inventory: pd.DataFrame, as_of=None):
+    """Additive turnover counters summed per GROUP_COLUMNS."""
+    as_of = pd.Timestamp(as_of or datetime.date.today())
+    sold = inventory["Status"].eq("SOLD").fillna(False).to_numpy(bool)
+    gate_in = inventory["Gate In"]
+    gate_out = inventory["Gate Out"]
+
+    age = (as_of - gate_in).dt.days.to_numpy(dtype=float)
+    dwell = (gate_out - gate_in).dt.days.to_numpy(dtype=float)
+    since_sale = (as_of - gate_out).dt.days.to_numpy(dtype=float)
+
+    # unsold units with a gate-in date fall in exactly one aging bucket
+    aged = ~sold & ~np.isnan(age)
+    bucket = np.searchsorted(AGING_EDGES, np.nan_to_num(np.maximum(age, 0)), side="left")
+    buckets = (bucket[:, None] == np.arange(len(AGING_BUCKETS))) & aged[:, None]
+
+    counters = pd.DataFrame(buckets.astype(np.int64), columns=AGING_BUCKETS, index=inventory.index)
+    counters["Units"] = 1
+    counters["Sold"] = sold.astype(np.int64)
+    counters["Unsold"] = (~sold).astype(np.int64)
+    counters["Recent Sold"] = (sold & (since_sale >= 0) & (since_sale < SALES_WINDOW)).astype(np.int64)
+    counters["Capital Tied Up"] = np.where(sold, 0.0, inventory["Purchase Cost"].fillna(0).to_numpy(dtype=float))
+    # dwell is averaged over sold units with both dates
+    counters["Dwell Days"] = np.where(sold, np.nan_to_num(dwell), 0.0)
+    counters["Dwell Units"] = (sold & ~np.isnan(dwell)).astype(np.int64)
+
+    keys = inventory[GROUP_COLUMNS].fillna("Unknown")
+    return counters.groupby([keys[col] for col in GROUP_COLUMNS]).sum().reset_index()
+
+
+@st.cache_data(show_spinner=False)
+def inventory_turnover(_inventory, inventory_version, as_of):
+    return turnover_counters(_inventory, as_of)
+
+
+def turnover_summary(counters: pd.DataFrame, by=("Depot", "Size", "Condition")):
+    """Counters re-summed by `by` (all rows when empty) with the derived turnover ratios."""
+    by = list(by)
+    totals = counters.groupby(by)[COUNTER_COLUMNS + ["Dwell Units"]].sum() if by else \
+        counters[COUNTER_COLUMNS + ["Dwell Units"]].sum().to_frame().T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        totals["Sell-Through %"] = totals["Sold"] / totals["Units"] * 100
+        totals["Avg Dwell Days"] = totals["Dwell Days"] / totals["Dwell Units"]
+        daily_sales = totals["Recent Sold"] / SALES_WINDOW
+        # days until the unsold units are gone at the recent sell rate
+        totals["Days of Inventory"] = np.where(daily_sales > 0, totals["Unsold"] / daily_sales, np.nan)
+
+    columns = ["Units", "Sold", "Unsold"] + AGING_BUCKETS + \
+              ["Sell-Through %", "Avg Dwell Days", "Days of Inventory", "Capital Tied Up"]
+    return totals[columns].reset_index(drop=not by)
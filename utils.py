@@ -1,36 +1,85 @@
+import numpy as np
 import pandas as pd
 import datetime
-import plotly.graph_objects as go
 import streamlit.components.v1 as components
-import streamlit as st
-import yfinance as yf
+
+
+# GSheetsConnection.read's own cache ttl; a reread with another ttl drops that cache
+READ_TTL = 3600
 
 months_list = ['January', 'February', 'March', 'April', 'May', 'June',
                'July', 'August', 'September', 'October', 'November', 'December']
 
 
+def load_inventory(conn, ttl=READ_TTL):
+    data_sheet = conn.read(worksheet="Data_Sheet", ttl=ttl)
+    return preprocess_data(data_sheet[5:])
 
-def load_data(conn, conn_2):
-    data_sheet = conn.read(worksheet="Data_Sheet")
-    data_sheet = preprocess_data(data_sheet[5:])
 
-    weekly_data = conn.read(worksheet="Market pricing", header=2).dropna(how="all").fillna(0)
-
-    location_data = conn.read(worksheet="Settings")
+def load_locations_map(conn, ttl=READ_TTL):
+    location_data = conn.read(worksheet="Settings", ttl=ttl)
     location_data['Location Code'] = location_data['Location Code'].apply(
         lambda x: x[:-1] if x[-1].isdigit() else x
     )
-    locations_map = location_data.set_index('Location Code')['Location'].to_dict()
+    return location_data.set_index('Location Code')['Location'].to_dict()
+
 
+def load_weekly_pricing(conn, locations_map, ttl=READ_TTL):
+    weekly_data = conn.read(worksheet="Market pricing", header=2, ttl=ttl).dropna(how="all").fillna(0)
     weekly_data["Location Name"] = weekly_data["Location"].map(locations_map)
-    weekly_data = process_week_data(week_data=weekly_data)
+    return process_week_data(week_data=weekly_data)
 
-    trading_pricing_data = conn_2.read(worksheet="Trading market price")
+
+def load_trading_prices(conn, ttl=READ_TTL):
+    trading_pricing_data = conn.read(worksheet="Trading market price", ttl=ttl)
     trading_pricing_data['DATE'] = pd.to_datetime(trading_pricing_data['DATE'], errors='coerce')
+    trading_pricing_data['MARKET_PRICE_USD'] = pd.to_numeric(trading_pricing_data['MARKET_PRICE_USD'], errors='coerce')
     trading_pricing_data['Year'] = trading_pricing_data['DATE'].dt.year
     trading_pricing_data['Month'] = trading_pricing_data['DATE'].dt.month_name().str[:3]
+    trading_pricing_data['MONTH_CODE'] = month_codes(trading_pricing_data['DATE'])
+    return trading_pricing_data
+
+
+def month_codes(dates: pd.Series):
+    """Months since year 0 as integers (year * 12 + month - 1), -1 where the date is missing."""
+    return (dates.dt.year * 12 + dates.dt.month - 1).fillna(-1).astype(np.int64)
+
+
+def month_starts(codes):
+    """First day of each month code, as datetimes."""
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.to_datetime(pd.DataFrame({"year": codes // 12, "month": codes % 12 + 1, "day": 1}))
+
+
+def current_month_code():
+    today = datetime.date.today()
+    return today.year * 12 + today.month - 1
+
+
+def monthly_counts(data: pd.DataFrame, columns: list):
+    """
+    Rows per month for each of the month code `columns`, as one frame indexed by month code
+    with a column per input column; missing months in between are not filled.
+    """
+    codes = np.concatenate([data[col].to_numpy(dtype=np.int64) for col in columns])
+    which = np.repeat(np.arange(len(columns)), len(data))
+    valid = codes >= 0
+    counts = pd.Series(1, index=[codes[valid], which[valid]]).groupby(level=[0, 1]).size() \
+        .unstack(fill_value=0).reindex(columns=range(len(columns)), fill_value=0)
+    counts.columns = columns
+    counts.index.name = "Month Code"
+    return counts
+
 
-    return data_sheet, weekly_data, trading_pricing_data
+def monthly_totals(data: pd.DataFrame, month_column, value_columns, by=None):
+    """Sum of `value_columns` per month code (and `by` columns), sorted by month code."""
+    valid = data[month_column].to_numpy() >= 0
+    return data[valid].groupby([month_column] + list(by or []))[value_columns].sum()
+
+
+def data_version(df: pd.DataFrame):
+    # content hash used to key caches of anything derived from a frame
+    return format(int(pd.util.hash_pandas_object(df, index=False).sum()) & (2 ** 64 - 1), "016x")
 
 
 def process_week_data(week_data):
@@ -51,6 +100,9 @@ def preprocess_data(data: pd.DataFrame):
     data["Dwell Time"] = (data["Gate Out"] - data["Gate In"]).dt.days
     data["Month"] = data["Gate In"].dt.month_name()
     data["Year"] = data["Gate In"].apply(extract_year)
+    # integer month buckets shared by the monthly charts
+    data["Gate In Month"] = month_codes(data["Gate In"])
+    data["Gate Out Month"] = month_codes(data["Gate Out"])
     return data
 
 
@@ -93,20 +145,14 @@ def extract_year(date):
 
 
 def get_filtered_data(df, location, depot, year):
-    filtered_df_prev = df.copy()
-    if location:
-        df = df[df["Location"].isin(location)]
-        filtered_df_prev = filtered_df_prev[filtered_df_prev["Location"].isin(location)]
-    if depot:
-        df = df[df["Depot"].isin(depot)]
-        filtered_df_prev = filtered_df_prev[filtered_df_prev["Depot"].isin(depot)]
-
-    filtered_df = df[df["Year"] == year]
-    filtered_df_prev = filtered_df_prev[
-        (filtered_df_prev["Gate In"] >= (pd.to_datetime(f"{year}-01-01") - pd.DateOffset(years=1))) &
-        (filtered_df_prev["Gate In"] < pd.to_datetime(f"{year}-01-01"))
-        ]
-    return filtered_df, filtered_df_prev
+    # the shared base frame is only read; each result is one take of its matching rows
+    rows = filter_rows(df, location, depot)
+    year_start = pd.to_datetime(f"{year}-01-01")
+    gate_in = df["Gate In"].to_numpy()[rows]
+    current = rows[df["Year"].to_numpy()[rows] == year]
+    previous = rows[(gate_in >= (year_start - pd.DateOffset(years=1)).to_datetime64()) &
+                    (gate_in < year_start.to_datetime64())]
+    return df.iloc[current], df.iloc[previous]
 
 
 
@@ -139,13 +185,24 @@ def pre_process_data(data: pd.DataFrame):
 
 
 def filter_data(data: pd.DataFrame, location, depot):
-    filtered_df = data.copy()
+    if not location and not depot:
+        return data
+    return data.iloc[filter_rows(data, location, depot)]
+
+
+def filter_rows(data: pd.DataFrame, location=None, depot=None):
+    """Row positions matching the Location / Depot filters; an empty filter keeps every row."""
+    mask = np.ones(len(data), dtype=bool)
     if location:
-        filtered_df = filtered_df[filtered_df["Location"].isin(location)]
+        mask &= data["Location"].isin(location).to_numpy()
     if depot:
-        filtered_df = filtered_df[filtered_df["Depot"].isin(depot)]
+        mask &= data["Depot"].isin(depot).to_numpy()
+    return np.flatnonzero(mask)
 
-    return filtered_df
+
+def take(data: pd.DataFrame, rows, columns):
+    """Just `columns` of the given rows, in one take; the base frame is not copied."""
+    return data.iloc[rows, data.columns.get_indexer(columns)]
 
 
 
@@ -253,79 +310,65 @@ def display_telegram_posts(df):
                         )
 
 
-@st.cache_data
-def get_commodities_data(ticker_name, commodities):
-    # Initialize an empty list to store the data
-    data_list = []
-
-    # Fetch the data for each commodity
-    for name, symbol in commodities.items():
-        ticker = yf.Ticker(symbol)
-
-        # Fetch data for the last two days to calculate daily changes
-        hist_daily = ticker.history(period="5d")
-        latest_close = None
-        if len(hist_daily) >= 2:
-            latest_close = hist_daily['Close'].iloc[-1]
-            previous_close = hist_daily['Close'].iloc[-2]
-            daily_point_change = latest_close - previous_close
-            daily_percent_change = round((daily_point_change / previous_close) * 100, 2)
-        else:
-            daily_point_change = daily_percent_change = None
-
-        # Fetch historical data for the trend
-        hist_trend = ticker.history(period="1mo")
-        trend_data = hist_trend['Close'].tolist()
-
-        data_list.append([
-            name, latest_close, daily_point_change, daily_percent_change, trend_data
-        ])
-
-    # DataFrame from the collected data
-    df = pd.DataFrame(data_list, columns=[
-        f"{ticker_name}", "Price", "Daily Change", "%age Diff", "Trend"
-    ])
-    df = df.dropna()
-
-    df["%age Diff"] = df["%age Diff"].apply(lambda x: str(round(x, 3))+"%")
-
-    return df
-
-
-def commodities_table(df):
-    def color_cells(val):
-        color = '#81b29a' if val[0] != '-' else '#f07167'
-        return f'background-color: {color}'
-
-    df["bgColor"] = df["DaysRemainingCode"].map({
-        "Red": "#e76f51",
-        "Yellow": "#e9c46a",
-        "Green": "#52b788"
+def download_closes(symbols, period="1mo", interval="1d"):
+    """Closes of `symbols` in one batched download, one column per symbol that returned data."""
+    # yfinance is only needed by the Macro tab, so it is imported on first use
+    import yfinance as yf
+
+    if not symbols:
+        return pd.DataFrame()
+    data = yf.download(sorted(set(symbols)), period=period, interval=interval, auto_adjust=True, progress=False,
+                       threads=True)
+    if data.empty:
+        return pd.DataFrame()
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    return closes.dropna(axis=1, how="all")
+
+
+def commodities_table(ticker_name, names, prices, previous_closes, trends):
+    """The Macro tab's Arrow table for one group, with the daily change from the previous closes."""
+    import pyarrow as pa
+
+    prices, previous_closes = np.asarray(prices, dtype=float), np.asarray(previous_closes, dtype=float)
+    changes = prices - previous_closes
+    return pa.table({
+        ticker_name: pa.array(names, type=pa.string()),
+        "Price": pa.array(prices, type=pa.float64()),
+        "Daily Change": pa.array(changes, type=pa.float64()),
+        "%age Diff": pa.array(np.round(changes / previous_closes * 100, 2), type=pa.float64()),
+        "Trend": pa.array(trends, type=pa.list_(pa.float64())),
     })
 
-    styler = df.style.applymap(color_cells, subset=["%age Diff"])
-    fig = go.Figure(
-        data=[go.Table(
-        columnwidth=[2, 2, 2, 2, 5],
-        header=dict(
-            values=list(df.columns),
-            font=dict(size=14, color='white', family='ubuntu'),
-            fill_color='#264653',
-            align=['center'],
-            height=80
-        ),
-        cells=dict(
-            values=[df[K].tolist() for K in df.columns],
-            font=dict(size=12, color="black", family='ubuntu'),
-            fill_color=['#f5ebe0', '#f5ebe0', '#f5ebe0', '#f5ebe0',
-                        df["DaysRemainingColor"].values, '#f5ebe0'],
-            align=['center'],
-            height=80
-        ))]
-    )
-    fig.update_layout(margin=dict(l=0, r=10, b=10, t=30), height=500)
-    return fig
 
+def get_commodities_data(ticker_name):
+    """
+    Latest close, daily change and one-month closing trend per commodity of a group, as an
+    Arrow table with float columns and a list<double> Trend column. The group's symbols
+    (from the registry, minus those backing off) are downloaded in one batch. Not cached
+    here: the Macro tab serves it through `sources`, which keeps the last table per group.
+    """
+    from symbols import due, record
+
+    commodities = due(ticker_name)
+    closes = download_closes(list(commodities.values()))
+
+    names, trends, results = [], [], {}
+    for name, symbol in commodities.items():
+        trend = closes[symbol].dropna() if symbol in closes else pd.Series(dtype=float)
+        # commodities without two recent closes have no change to show
+        results[symbol] = len(trend) >= 2
+        if results[symbol]:
+            names.append(name)
+            trends.append(trend.to_numpy(dtype=float))
+
+    if commodities and not names:
+        # nothing came back at all: a network or API outage, not dead symbols
+        raise RuntimeError(f"no {ticker_name} commodity data returned")
+    record(results)
+    return commodities_table(ticker_name, names, [trend[-1] for trend in trends], [trend[-2] for trend in trends],
+                             trends)
 
 
 # @st.cache_data
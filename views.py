@@ -1,41 +1,37 @@
+import datetime
+
 import pandas as pd
 import streamlit as st
-from plotly.subplots import make_subplots
 
 from css.st_ui import plotly_svg_css_2, plotly_svg_css_1
-from plots import format_hover_layout, get_weekly_data_table, \
-    container_prices_wrt_location, container_count_plot, container_prices_plot, get_market_price_map, \
+from plots import container_prices_wrt_location, container_count_plot, container_prices_plot, get_market_price_map, \
     biggest_growth_and_drop_in_prices, sales_overtime, sold_inv_dist, gate_in_out_distribution, top_customers, \
-    commodities_info, container_prices_and_count, get_wci_chart
-from scraper.calendar_scraper import get_geopolitical_calendar
-from scraper.news_scraper import extract_news
-from scraper.wci_scraper import get_wci_data
-from utils import get_filtered_data, get_coi, get_inv_sold, get_inv_under_repair, get_inv_picked, get_gatein_aging, \
+    commodities_info, container_prices_and_count, wci_trend_plot, landed_cost_plot, shipping_costs_plot, location_map, \
+    aging_buckets_plot, sales_cost_breakdown_plot, margin_by_group_plot
+from shipping import inventory_landed_costs, landed_cost_summary
+from tables import weekly_data_table, wci_table, price_movers_table, price_alerts_table
+from analytics import price_alerts, event_price_moves, WINDOW, Z_THRESHOLD, EVENT_WINDOW
+from turnover import turnover_summary, AGING_BUCKETS, SALES_WINDOW
+from economics import economics_summary, GROUP_OPTIONS
+from utils import get_filtered_data, filter_data, filter_rows, get_coi, get_inv_sold, get_inv_under_repair, get_inv_picked, get_gatein_aging, \
     get_dwell_time, format_kpi_value, display_telegram_posts
 
 from const import Commodities
-
-import plotly.graph_objects as go
+from render import plotly_chart, dataframe, payload_report
+from scheduler import RenderPlan, render_report
+from sources import Source, latest, revalidate, place, fill
+from quotes import QUOTE_INTERVAL
 
 
 colors = ["#264653", "#2a9d8f", "#e9c46a", "#f4a261", "#e76f51", "#84a59d", "#006d77",
           "#f6bd60", "#90be6d", "#577590", "#e07a5f", "#81b29a", "#f2cc8f", "#0081a7"]
 
 
-def overview_page(week_data):
-    st.markdown(plotly_svg_css_1, unsafe_allow_html=True)
-    with st.sidebar:
-        loc = st.multiselect(label="Location", options=set(week_data["Location Name"].dropna().values), placeholder="All")
-        if not loc:
-            loc = set(week_data["Location Name"].dropna().values)
-
-        size = st.multiselect(label="Size", options=set(week_data["Size"].dropna().values), placeholder="All")
-        if not size:
-            size = set(week_data["Size"].dropna().values)
-
-        condition = st.multiselect(label="Condition", options=set(week_data["Condition"].dropna().values), placeholder="All")
-        if not condition:
-            condition = set(week_data["Condition"].dropna().values)
+def overview_content(week_data, loc=None, size=None, condition=None):
+    """KPIs and figures of the Overview tab; an empty filter selects everything."""
+    loc = loc or set(week_data["Location Name"].dropna().values)
+    size = size or set(week_data["Size"].dropna().values)
+    condition = condition or set(week_data["Condition"].dropna().values)
 
     filtered_week_df = week_data[(week_data["Location Name"].isin(loc)) &
                                  (week_data["Size"].isin(size)) &
@@ -43,35 +39,51 @@ def overview_page(week_data):
 
     cols_of_interest = ["Real Time", "On the way", "Avg Market Price", "AMMT Market Price"]
     filtered_week_df = filtered_week_df[~((filtered_week_df[cols_of_interest] == 0) |
-                                          (filtered_week_df[cols_of_interest].isna())).all(axis=1)].drop(columns=["Location Name"], axis=1)
-
-
-    kpis_row = st.columns(5)
-
-    kpis_row[0].metric(label="Total Containers", value=int(filtered_week_df["Real Time"].sum()))
-    kpis_row[1].metric(label="Containers On the Way", value=int(filtered_week_df["On the way"].sum()))
-    kpis_row[2].metric(label="Avg Market Price", value=format_kpi_value(filtered_week_df[filtered_week_df["Avg Market Price"]>0]["Avg Market Price"].mean()))
-    kpis_row[3].metric(label="AMMT Market Price", value=format_kpi_value(filtered_week_df[filtered_week_df["AMMT Market Price"]>0]["AMMT Market Price"].mean()))
-    kpis_row[4].metric(label="Total Market Price", value=format_kpi_value(filtered_week_df[filtered_week_df["AMMT Market Price"]>0]["AMMT Market Price"].sum()))
-
+                                          (filtered_week_df[cols_of_interest].isna())).all(axis=1)]
+    stock_by_location = filtered_week_df.groupby("Location Name").agg(
+        **{"Stock": ("Real Time", "sum"),
+           "Avg Market Price": ("Avg Market Price", lambda x: x[x > 0].mean())}).reset_index()
+    filtered_week_df = filtered_week_df.drop(columns=["Location Name"], axis=1)
+
+    priced = filtered_week_df[filtered_week_df["AMMT Market Price"] > 0]["AMMT Market Price"]
+    kpis = [
+        {"label": "Total Containers", "value": int(filtered_week_df["Real Time"].sum())},
+        {"label": "Containers On the Way", "value": int(filtered_week_df["On the way"].sum())},
+        {"label": "Avg Market Price", "value": format_kpi_value(
+            filtered_week_df[filtered_week_df["Avg Market Price"] > 0]["Avg Market Price"].mean())},
+        {"label": "AMMT Market Price", "value": format_kpi_value(priced.mean())},
+        {"label": "Total Market Price", "value": format_kpi_value(priced.sum())},
+    ]
+    figures = {
+        "Weekly Pricing": weekly_data_table(df=filtered_week_df),
+        "Stock by Location": location_map(stock_by_location, "Location Name", "Stock", "Avg Market Price",
+                                          title="Stock & Market Price by Location",
+                                          size_label="Containers", color_label="Avg Market Price"),
+    }
+    return kpis, figures
+
+
+def overview_page(dataset):
+    st.markdown(plotly_svg_css_1, unsafe_allow_html=True)
+    week_data = dataset.weekly_pricing()
+    with st.sidebar:
+        loc = st.multiselect(label="Location", options=set(week_data["Location Name"].dropna().values), placeholder="All")
+        size = st.multiselect(label="Size", options=set(week_data["Size"].dropna().values), placeholder="All")
+        condition = st.multiselect(label="Condition", options=set(week_data["Condition"].dropna().values), placeholder="All")
 
-    st.plotly_chart(get_weekly_data_table(df=filtered_week_df), use_container_width=True)
+    kpis, figures = overview_content(week_data, loc, size, condition)
+    for column, kpi in zip(st.columns(5), kpis):
+        column.metric(**kpi)
 
+    plotly_chart(st, figures["Weekly Pricing"], name="Weekly Pricing")
+    plotly_chart(st, figures["Stock by Location"])
 
-def sales_analytics_page(data):
-    st.markdown(plotly_svg_css_2, unsafe_allow_html=True)
-    # ------------------------ Filters ------------------------------------------------
-    location = st.sidebar.multiselect(label="Location", options=set(data["Location"].dropna().values), placeholder="All")
-    depot = st.sidebar.multiselect(label="Depot", options=set(data["Depot"].dropna().values), placeholder="All")
-    year = st.sidebar.selectbox(label="Year", options=sorted(list(data["Year"].unique())), index=2)
 
-    # Filtered Data
+def sales_content(dataset, location, depot, year, shipping_costs=None):
+    """KPIs and sales figures of the Sales Analytics tab, and whether the filters matched any unit."""
+    data = dataset.inventory()
     filtered_df, filtered_df_prev = get_filtered_data(data, location, depot, year)
 
-    # ------------------------- Main Display ---------------------------------------
-    if len(filtered_df) == 0:
-        st.warning("No Data Record found.")
-    # -------------------------- KPIs calculation ----------------------------------
     cost_of_inventory, percentage_change_coi = get_coi(filtered_df, filtered_df_prev)
     inventory_sold, percentage_change_is = get_inv_sold(filtered_df, filtered_df_prev)
     inv_under_repair, percentage_change_ur = get_inv_under_repair(filtered_df, filtered_df_prev)
@@ -79,137 +91,384 @@ def sales_analytics_page(data):
     gatein_aging, percentage_change_gia = get_gatein_aging(filtered_df, filtered_df_prev)
     dwell_time, percentage_change_dt = get_dwell_time(filtered_df, filtered_df_prev)
 
-    # -------------------------- KPIs Display ---------------------------------------
-    kpi_row = st.columns(6)
-    kpi_row[0].metric(label="Cost of Inventory",
-                      value=f"{format_kpi_value(cost_of_inventory)}",
-                      delta=f"{percentage_change_coi:.1f}%")
-
-    kpi_row[1].metric(label="Inventory Sold",
-                      value=f"{format_kpi_value(inventory_sold)}",
-                      delta=f"{percentage_change_is:.1f}%")
-
-    kpi_row[2].metric(label="Inventory Undergoing Repairs",
-                      value=f"{format_kpi_value(inv_under_repair)}",
-                      delta=f"{percentage_change_ur:.1f}%")
+    kpis = [
+        {"label": "Cost of Inventory", "value": f"{format_kpi_value(cost_of_inventory)}",
+         "delta": f"{percentage_change_coi:.1f}%"},
+        {"label": "Inventory Sold", "value": f"{format_kpi_value(inventory_sold)}",
+         "delta": f"{percentage_change_is:.1f}%"},
+        {"label": "Inventory Undergoing Repairs", "value": f"{format_kpi_value(inv_under_repair)}",
+         "delta": f"{percentage_change_ur:.1f}%"},
+        {"label": "Inventory Picked Up", "value": f"{inv_picked} items",
+         "delta": f"{percentage_change_ip:.1f}%"},
+        # Aging of Inventory (Gate In to Today)
+        {"label": "Inv Aging", "value": f"{gatein_aging:.1f} days",
+         "delta": f"{percentage_change_gia:.1f}%"},
+        # Dwell Time (Gate In to Sell Date), 0 when no unit in the selection was sold
+        {"label": "Dwell Time", "value": f"{0 if pd.isna(dwell_time) else int(dwell_time)} days",
+         "delta": f"{percentage_change_dt:.1f}%"},
+    ]
+
+    # the four charts share one row selection and are built concurrently
+    plan = RenderPlan("Sales Analytics").input("rows", lambda: filter_rows(data, location, depot))
+    plan.figure("Sales Over Time", lambda rows: sales_overtime(data, location, depot, rows), "rows")
+    plan.figure("Sold Inventory", lambda rows: sold_inv_dist(data, location, depot, rows), "rows")
+    plan.figure("Gate In/Out", lambda rows: gate_in_out_distribution(data, location, depot, rows), "rows")
+    plan.figure("Top Customers", lambda rows: top_customers(data, location, depot, rows), "rows")
+    figures = plan.run()
+    # Landed cost per unit: one vectorized join of the inventory against the shipping cost matrix
+    if shipping_costs is not None:
+        landed = inventory_landed_costs(data, dataset.version("inventory"), dataset.locations_map(),
+                                        dataset.version("locations_map"), shipping_costs)
+        summary = landed_cost_summary(filter_data(landed, location, depot))
+        if len(summary):
+            figures["Landed Cost"] = landed_cost_plot(summary)
+    return len(filtered_df) == 0, kpis, figures
+
+
+def turnover_content(dataset, location, depot, as_of):
+    """Turnover KPIs, the aging chart and the turnover table for the given filters."""
+    counters = filter_data(dataset.turnover(as_of), location, depot)
+    overall = turnover_summary(counters, by=()).iloc[0]
+    kpis = [
+        {"label": "Sell-Through", "value": f"{overall['Sell-Through %']:.1f}%"},
+        # unsold units at the last SALES_WINDOW days' sell rate
+        {"label": "Days of Inventory",
+         "value": "—" if pd.isna(overall["Days of Inventory"]) else f"{overall['Days of Inventory']:.0f} days",
+         "help": f"Unsold units divided by the daily sales of the last {SALES_WINDOW} days"},
+        {"label": "Capital Tied Up", "value": format_kpi_value(overall["Capital Tied Up"])},
+        {"label": "Aged 180+ days", "value": f"{int(overall['180+ days'])} units"},
+    ]
+    aging = aging_buckets_plot(turnover_summary(counters, by=["Depot"]), AGING_BUCKETS)
+    return kpis, aging, turnover_summary(counters)
+
+
+def economics_content(dataset, location, depot, group="Customer"):
+    """Unit-economics KPIs, the monthly cost breakdown and the margins by `group`."""
+    economics = filter_data(dataset.economics(), location, depot)
+    overall = economics_summary(economics).iloc[0]
+    kpis = [
+        {"label": "Avg Margin per Unit", "value": format_kpi_value(overall["Avg Margin"])},
+        {"label": "Margin", "value": f"{overall['Margin %']:.1f}%"},
+        {"label": "ROI", "value": f"{overall['ROI %']:.1f}%"},
+        {"label": "Unsold Value over Cost",
+         "value": format_kpi_value(overall["Inventory Value"] - overall["Inventory Cost"])},
+    ]
+    by_month = economics_summary(economics, by=GROUP_OPTIONS["Month"]).set_index("Month")
+    by_group = economics_summary(economics, by=GROUP_OPTIONS[group]).sort_values("Margin", ascending=False)
+    figures = {
+        "Cost Breakdown": sales_cost_breakdown_plot(
+            by_month[["Avg Purchase Cost", "Avg Repair Cost", "Avg Storage Cost"]], by_month["Avg Revenue"]),
+        f"Margins by {group}": margin_by_group_plot(by_group.head(15), group),
+    }
+    return kpis, figures
+
+
+TURNOVER_COLUMN_CONFIG = {
+    "Sell-Through %": st.column_config.NumberColumn(format="%.1f%%"),
+    "Avg Dwell Days": st.column_config.NumberColumn(format="%.0f"),
+    "Days of Inventory": st.column_config.NumberColumn(format="%.0f"),
+    "Capital Tied Up": st.column_config.NumberColumn(format="$%.0f"),
+}
+
+
+def sales_analytics_page(dataset):
+    st.markdown(plotly_svg_css_2, unsafe_allow_html=True)
+    data = dataset.inventory()
+    # ------------------------ Filters ------------------------------------------------
+    location = st.sidebar.multiselect(label="Location", options=set(data["Location"].dropna().values), placeholder="All")
+    depot = st.sidebar.multiselect(label="Depot", options=set(data["Depot"].dropna().values), placeholder="All")
+    year = st.sidebar.selectbox(label="Year", options=sorted(list(data["Year"].unique())), index=2)
 
-    kpi_row[3].metric(label="Inventory Picked Up",
-                      value=f"{inv_picked} items",
-                      delta=f"{percentage_change_ip:.1f}%")
+    # the shipping cost table is served like the Macro tab's: the last scrape is used at once and
+    # a stale one is refetched in the background, so the Landed Cost chart never waits on the scrape
+    shipping_costs = shipping_costs_source()
+    revalidate(shipping_costs)
+    empty, kpis, figures = sales_content(dataset, location, depot, year, latest(shipping_costs)[0])
 
-    kpi_row[4].metric(label="Inv Aging",  # Aging of Inventory (Gate In to Today)
-                      value=f"{gatein_aging:.1f} days",
-                      delta=f"{percentage_change_gia:.1f}%")
-    try:
-        kpi_row[5].metric(label="Dwell Time",  # Dwell Time (Gate In to Sell Date)
-                          value=f"{int(dwell_time)} days",
-                          delta=f"{percentage_change_dt:.1f}%")
-    except ValueError:
-        kpi_row[5].metric(label="Dwell Time",  # Dwell Time (Gate In to Sell Date)
-                          value=f"{0} days",
-                          delta=f"{percentage_change_dt:.1f}%")
+    # ------------------------- Main Display ---------------------------------------
+    if empty:
+        st.warning("No Data Record found.")
+    for column, kpi in zip(st.columns(6), kpis):
+        column.metric(**kpi)
 
     charts_row = st.columns((2,1))
-    charts_row[0].plotly_chart(sales_overtime(data, location, depot), use_container_width=True)
-    charts_row[1].plotly_chart(sold_inv_dist(data, location, depot), use_container_width=True)
-
-    charts_row[0].plotly_chart(gate_in_out_distribution(data, location, depot), use_container_width=True)
-    charts_row[1].plotly_chart(top_customers(data, location, depot), use_container_width=True)
-
-def trading_prices_page(df_trading):
+    plotly_chart(charts_row[0], figures["Sales Over Time"])
+    plotly_chart(charts_row[1], figures["Sold Inventory"])
+
+    plotly_chart(charts_row[0], figures["Gate In/Out"])
+    plotly_chart(charts_row[1], figures["Top Customers"])
+
+    if "Landed Cost" in figures:
+        plotly_chart(st, figures["Landed Cost"])
+
+    # ------------------------- Inventory Turnover ---------------------------------
+    st.write("### Inventory Turnover")
+    kpis, aging, turnover_table = turnover_content(dataset, location, depot, datetime.date.today())
+    for column, kpi in zip(st.columns(4), kpis):
+        column.metric(**kpi)
+
+    turnover_charts = st.columns((1, 2))
+    plotly_chart(turnover_charts[0], aging)
+    dataframe(turnover_charts[1], turnover_table, name="Inventory Turnover",
+              column_config=TURNOVER_COLUMN_CONFIG, hide_index=True, use_container_width=True)
+
+    # ------------------------- Unit Economics -------------------------------------
+    st.write("### Unit Economics")
+    economics_row = st.columns((1, 1, 1, 1, 2))
+    group = economics_row[4].selectbox(label="Margins by", options=[key for key in GROUP_OPTIONS if key != "Month"])
+    kpis, figures = economics_content(dataset, location, depot, group)
+    for column, kpi in zip(economics_row, kpis):
+        column.metric(**kpi)
+
+    economics_charts = st.columns(2)
+    plotly_chart(economics_charts[0], figures["Cost Breakdown"])
+    plotly_chart(economics_charts[1], figures[f"Margins by {group}"])
+
+
+def trading_market_content(trading_index, container_type, condition, start, end):
+    """Market-wide figures of the Trading Prices tab, and the cities with prices in the selection."""
+    plan = RenderPlan("Trading Prices")
+    # Binary search over the sorted (CITY, TYPE, CONDITION, DATE) index
+    plan.input("filtered", lambda: trading_index.select(container_type=container_type, condition=condition,
+                                                        start=start, end=end))
+    plan.input("movers", biggest_growth_and_drop_in_prices, "filtered")
+    plan.input("by_city", lambda filtered: filtered.groupby("CITY").agg(
+        **{"Listed": ("CONTAINER_COUNT", "sum"), "Avg Price": ("MARKET_PRICE_USD", "mean")}).reset_index(), "filtered")
+
+    plan.figure("Prices by Location", container_prices_wrt_location, "filtered")
+    plan.figure("Container Count", container_count_plot, "filtered")
+    plan.figure("Prices by City", lambda by_city: location_map(by_city, "CITY", "Listed", "Avg Price",
+                                                               title="Container Prices by City",
+                                                               size_label="Listed Containers",
+                                                               color_label="Avg Price"), "by_city")
+    plan.figure("Biggest Growth", lambda movers: price_movers_table(
+        data=movers[0].head(5), indicator='green', table_title='Locations with biggest Week-on-Week growth'), "movers")
+    plan.figure("Biggest Drop", lambda movers: price_movers_table(
+        data=movers[1].head(5), indicator='red', table_title='Locations with biggest Week-on-Week drop'), "movers")
+    figures = plan.run()
+    return figures, plan.values["filtered"]['CITY'].unique()
+
+
+def trading_city_content(dataset, city, container_type, condition, start, end):
+    """Price history with its forecast band and the market price map for one city."""
+    filtered_loc_data = dataset.trading().select(city=city, container_type=container_type, condition=condition,
+                                                 start=start, end=end)
+    forecast = dataset.trading_forecasts().forecast(city, container_type, condition)
+    return {"Price History": container_prices_plot(filtered_loc_data, forecast),
+            "Market Price Map": get_market_price_map(filtered_loc_data)}
+
+
+def trading_alerts(dataset, container_type, condition, start, end, city=None):
+    """Prices more than Z_THRESHOLD standard deviations away from their trailing window."""
+    trading_index = dataset.trading()
+    return price_alerts(trading_index, dataset.trading_stats(),
+                        trading_index.positions(city=city, container_type=container_type, condition=condition,
+                                                start=start, end=end))
+
+
+def trading_prices_page(dataset):
     st.markdown(plotly_svg_css_2, unsafe_allow_html=True)
+    trading_index = dataset.trading()
     row_1 = st.columns((1, 1, 1, 2, 1))
     container_type = row_1[1].selectbox(label="Container Type",
-                                        options=df_trading["CONTAINER_TYPE"].unique())
+                                        options=trading_index.unique("CONTAINER_TYPE"))
     container_condition = row_1[2].selectbox(label="Container Condition",
-                                             options=df_trading["CONTAINER_CONDITION"].unique())
+                                             options=trading_index.unique("CONTAINER_CONDITION"))
+    min_date, max_date = trading_index.min_date.to_pydatetime(), trading_index.max_date.to_pydatetime()
     selected_range = row_1[3].slider(
         'Select Date Range:',
-        min_value=df_trading['DATE'].min().to_pydatetime(),
-        max_value=df_trading['DATE'].max().to_pydatetime(),
-        value=(df_trading['DATE'].min().to_pydatetime(), df_trading['DATE'].max().to_pydatetime()),
+        min_value=min_date,
+        max_value=max_date,
+        value=(min_date, max_date),
         format='MMM YYYY'
     )
     selected_start, selected_end = pd.to_datetime(selected_range[0]), pd.to_datetime(selected_range[1])
-
-    # Combine all conditions into a single filter
-    filter_mask = ((df_trading['DATE'] >= selected_start) & (df_trading['DATE'] <= selected_end) &
-                   (df_trading["CONTAINER_TYPE"] == container_type) &
-                   (df_trading["CONTAINER_CONDITION"] == container_condition))
-    # Apply the combined filter to df_trading
-    filtered_data = df_trading[filter_mask]
+    figures, cities = trading_market_content(trading_index, container_type, container_condition,
+                                             selected_start, selected_end)
 
     row_2 = st.columns(2)
-    row_2[0].plotly_chart(container_prices_wrt_location(filtered_data), use_container_width=True)
-
-    container_count_fig = container_count_plot(filtered_data)
-    row_2[1].plotly_chart(container_count_fig, use_container_width=True)
+    plotly_chart(row_2[0], figures["Prices by Location"])
+    plotly_chart(row_2[1], figures["Container Count"])
+    plotly_chart(st, figures["Prices by City"])
 
     st.write("# ")
 
     row_3 = st.columns(2)
-    selected_city = row_3[0].selectbox(label="Location", options=filtered_data['CITY'].unique())
-    filtered_loc_data = filtered_data[filtered_data['CITY'] == selected_city]
-    row_3[0].plotly_chart(container_prices_plot(filtered_loc_data), use_container_width=True)
+    selected_city = row_3[0].selectbox(label="Location", options=cities)
+    city_figures = trading_city_content(dataset, selected_city, container_type, container_condition,
+                                        selected_start, selected_end)
+    plotly_chart(row_3[0], city_figures["Price History"])
     row_3[1].write("## ")
-    row_3[1].plotly_chart(get_market_price_map(filtered_loc_data), use_container_width=True)
+    plotly_chart(row_3[1], city_figures["Market Price Map"])
 
     st.write("# ")
     row_4 = st.columns(2)
-    biggest_growth, biggest_drop = biggest_growth_and_drop_in_prices(filtered_data)
-    with row_4[0]:
-        st.write("##### Locations with biggest Week-on-Week growth")
-        # Display the DataFrame as a table
-        styler = biggest_growth.head(5).style.applymap(lambda x: 'color:green;' if "%" in x else '').hide()
-        st.write(styler.to_html(escape=False), unsafe_allow_html=True)
-    with row_4[1]:
-        st.write("##### Locations with biggest Week-on-Week drop")
-        # Display the DataFrame as a table
-        styler = biggest_drop.head(5).style.applymap(lambda x: 'color:red;' if "%" in x else '').hide()
-        st.write(styler.to_html(escape=False), unsafe_allow_html=True)
-
-    # table_row[0].plotly_chart(prices_variation_chart(data=biggest_growth.head(5),
-    #                                                  indicator='green',
-    #                                                  table_title='Locations with biggest Week-on-Week growth'))
-    # table_row[1].plotly_chart(prices_variation_chart(data=biggest_drop.head(5),
-    #                                                  indicator='red',
-    #                                                  table_title='Locations with biggest Week-on-Week drop'))
-
-
-def calendar_page():
-    df = get_geopolitical_calendar()
-
-    filters_row = st.columns((1, 2, 2, 1))
+    plotly_chart(row_4[0], figures["Biggest Growth"])
+    plotly_chart(row_4[1], figures["Biggest Drop"])
+
+    alerts = trading_alerts(dataset, container_type, container_condition, selected_start, selected_end)
+    if len(alerts):
+        plotly_chart(st, price_alerts_table(alerts))
+    else:
+        st.info(f"No price moves beyond {Z_THRESHOLD}σ of the trailing {WINDOW}-observation window.")
+
+
+CALENDAR_MAX_AGE = 6 * 3600
+
+
+def calendar_page(dataset):
+    from scraper.calendar_scraper import update_calendar_archive, latest_archive
+    from calendar_index import PAGE_SIZE, calendar_index, results_page
+
+    # the archive of every scraped event is searched while the calendar is rescraped in the background
+    source = Source("calendar", update_calendar_archive, CALENDAR_MAX_AGE, stored=latest_archive,
+                    label="Geopolitical calendar")
+    future = revalidate(source)
+    df, fetched_at = latest(source)
+    if df is None and future is None:
+        # the last fetch failed and there is nothing to fall back on
+        st.warning("Geopolitical calendar not available.")
+        return
+    if df is None:
+        try:
+            with st.spinner("Fetching the calendar..."):
+                df, fetched_at = future.result()
+        except Exception as e:
+            st.warning(f"Geopolitical calendar not available: {e}")
+            return
+    index = calendar_index(df, fetched_at)
+
+    filters_row = st.columns((2, 2, 2, 2, 1))
+    with filters_row[0]:
+        dated = df["Date"].dropna()
+        full_range = () if dated.empty else (dated.min().date(), dated.max().date())
+        date_range = st.date_input("Dates:", value=full_range)
     with filters_row[1]:
         # Extract unique locations for the multiselect filter (assuming the 'Location' column exists)
-        unique_locations = df['Location'].unique().tolist()
+        unique_locations = df['Location'].dropna().unique().tolist()
         # Use a multiselect widget for filtering by location
         selected_locations = st.multiselect('Filter by Location:', options=unique_locations,
                                             placeholder='All')
-        if len(selected_locations) == 0:
-            selected_locations = unique_locations
 
     with filters_row[2]:
         event_query = st.text_input('Search in Event:', '')
+    with filters_row[3]:
+        # the trading sheet is only read once price moves are asked for, and can't take the events down
+        trading_index, price_city = None, "All cities"
+        show_moves = st.toggle("Price moves")
+        if show_moves:
+            try:
+                trading_index = dataset.trading()
+            except Exception as e:
+                st.warning(f"Trading prices not available: {e}")
+            else:
+                price_city = st.selectbox("Price moves in:", options=["All cities"] + list(trading_index.unique("CITY")))
+
+    rows = None
+    # the whole span is no date filter, so undated events stay listed
+    if len(date_range) == 2 and tuple(date_range) != full_range:
+        rows = index.rows_between(*date_range)
+    if selected_locations:
+        rows = index.rows_at(selected_locations) if rows is None else rows & index.rows_at(selected_locations)
+    order = index.search(event_query, rows)
+
+    pages = max(1, -(-len(order) // PAGE_SIZE))
+    with filters_row[4]:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+    filtered_df = results_page(index, order, min(page, pages))
+    # price moves are only computed for the events on the page, NaN when the prices couldn't be read
+    if show_moves:
+        filtered_df = filtered_df.assign(**{"Price Move": float("nan") if trading_index is None else event_price_moves(
+            trading_index, filtered_df["Date"], city=None if price_city == "All cities" else price_city)})
+    st.caption(f"{len(order)} events · page {min(page, pages)} of {pages}"
+               + (f" · updated {fetched_at:%b %d %H:%M}" if fetched_at is not None else "")
+               + (f" · price move: mean container price {EVENT_WINDOW.days} days after vs before the event"
+                  if show_moves else ""))
+
+    # Typed Arrow columns straight to the data grid, flags drawn from their URLs
+    dataframe(st, filtered_df, name="Geopolitical Calendar", hide_index=True,
+              column_order=["Flag", "Location", "Date Text", "Event"]
+                           + (["Price Move"] if show_moves else []),
+              column_config={
+                  "Flag": st.column_config.ImageColumn("", width="small"),
+                  "Date Text": st.column_config.TextColumn("Date"),
+                  "Event": st.column_config.TextColumn("Event", width="large"),
+                  "Price Move": st.column_config.NumberColumn("Price Move", format="%+.1f%%"),
+              },
+              height=min(36 * (len(filtered_df) + 1), 900))
+
+
+# how long a Macro tab source is shown before it is refetched
+COMMODITIES_MAX_AGE = 15 * 60
+SHIPPING_COSTS_MAX_AGE = 6 * 3600
+
+
+def shipping_costs_source():
+    from shipping import fetch_shipping_costs
+
+    return Source("shipping_costs", fetch_shipping_costs, SHIPPING_COSTS_MAX_AGE)
+
+
+def _fetch_wci():
+    from scraper.wci_scraper import update_wci_history, latest_wci_data
+
+    update_wci_history()
+    return latest_wci_data()[0]
+
+
+def macro_sources():
+    """{section: Source} behind the Macro tab."""
+    from functools import partial
+    from scraper.wci_scraper import latest_wci_data, SNAPSHOT_MAX_AGE
+    from utils import get_commodities_data
+    from quotes import intraday_table
+
+    sources = {
+        "wci": Source("wci", _fetch_wci, SNAPSHOT_MAX_AGE.total_seconds(), stored=latest_wci_data,
+                      label="WCI"),
+        "shipping_costs": shipping_costs_source(),
+    }
+    for group in Commodities:
+        # intraday mode patches quotes into the group's table, the daily mode refetches it whole
+        fetch = partial(intraday_table if QUOTE_INTERVAL else get_commodities_data, group.name)
+        sources[group.name] = Source(f"commodities_{group.name.lower()}", fetch,
+                                     QUOTE_INTERVAL or COMMODITIES_MAX_AGE, label=f"{group.name.title()} commodities")
+    return sources
+
+
+@st.fragment(run_every=QUOTE_INTERVAL or None)
+def commodities_sections(sources):
+    """
+    The commodity tables. On a full run they are only placed, and the page fills them along
+    with its other sections; in intraday mode the fragment reruns on its own every quote
+    interval and fills them itself.
+    """
+    sections = []
+    for group in Commodities:
+        st.write(f"### {group.name} Commodities Data")
+        sections.append((sources[group.name], st.container(),
+                         lambda container, table, final, name=group.name: commodities_info(container, name, table)))
+    pending = place(sections)
+    if not st.session_state.get("macro_full_run", False):
+        fill(pending)
+    return pending
+
+
+def commodities_page(dataset):
+    from scraper.wci_scraper import get_wci_history
+
+    # start the stale fetches before drawing anything
+    sources = macro_sources()
+    for source in sources.values():
+        revalidate(source)
 
-    filtered_df = df[df['Location'].isin(selected_locations)]
-    if event_query:
-        # If there's a query, further filter the DataFrame
-        filtered_df = filtered_df[filtered_df['Event'].str.contains(event_query, case=False, na=False)]
-
-    # Display the DataFrame as a table
-    styler = filtered_df.style.hide()
-    st.write(styler.to_html(escape=False), unsafe_allow_html=True)
-
-
-def commodities_page(df_trading):
     st.markdown(plotly_svg_css_1, unsafe_allow_html=True)
+    trading_index = dataset.trading()
 
     row_1 = st.columns((5,3))
     with row_1[0]:
         inner_cols = st.columns(3)
-        selected_city = inner_cols[0].selectbox(label="Location", options=df_trading['CITY'].unique())
-        data = df_trading[df_trading['CITY'] == selected_city]
+        selected_city = inner_cols[0].selectbox(label="Location", options=trading_index.unique("CITY"))
 
         time_period = inner_cols[1].selectbox(label="Range", options=['All', 'YTD', '6m', '1y', '2y'], index=0)
         today = pd.to_datetime("today")
@@ -223,22 +482,57 @@ def commodities_page(df_trading):
             start_date = today - pd.DateOffset(years=2)
         else:
             start_date = None
-        if start_date:
-            data = data[data['DATE'] >= start_date]
-
-    row_1[0].plotly_chart(container_prices_and_count(data), use_container_width=True)
-
-    wci_data = get_wci_data()
-    # row_1[1].dataframe(wci_data)
-    row_1[1].plotly_chart(get_wci_chart(wci_data), use_container_width=True)
-
-    commodities_info(Commodities)
+        data = trading_index.select(city=selected_city, start=start_date)
+
+    plotly_chart(row_1[0], container_prices_and_count(data))
+
+    def draw_wci(container, wci_data, final):
+        plotly_chart(container, wci_table(wci_data), name="WCI")
+        # WCI history is served from the local snapshot store over the selected range
+        wci_history = get_wci_history(start=start_date)
+        if wci_history["Scraped At"].nunique() > 1:
+            plotly_chart(container, wci_trend_plot(wci_history))
+
+    def draw_shipping_costs(container, shipping_costs, final):
+        # the size picker is only created once per run, with the final value
+        if final:
+            size = container.selectbox(label="Container Size", options=shipping_costs.columns,
+                                       format_func=lambda x: f"{x} FT", key="shipping_size")
+        else:
+            size = st.session_state.get("shipping_size", shipping_costs.columns[0])
+        plotly_chart(container, shipping_costs_plot(shipping_costs.reset_index(), size))
+
+    # every section is placed at once and filled as its source lands, fastest first
+    pending = place([(sources["wci"], row_1[1], draw_wci),
+                     (sources["shipping_costs"], row_1[1], draw_shipping_costs)])
+    # only set while the page calls the fragment, so it can't outlive this run even if the call raises
+    st.session_state["macro_full_run"] = True
+    try:
+        pending += commodities_sections(sources)
+    finally:
+        del st.session_state["macro_full_run"]
+    fill(pending)
 
 
 def news_page():
+    from scraper.news_scraper import extract_news
+
     header = st.columns((3,1,3))
     header[1].write("### Port Pulse Updates")
     st.write("# ")
     df_news = extract_news()
     df_news = df_news.iloc[::-1].reset_index(drop=True)
     display_telegram_posts(df_news)
+
+
+def diagnostics_panel():
+    """Sidebar expander with what the last run sent to the browser; drawn after the page."""
+    from symbols import health_report
+
+    with st.sidebar.expander("Diagnostics"):
+        st.write("Payloads")
+        st.dataframe(payload_report(), hide_index=True, use_container_width=True)
+        st.write("Figure build times")
+        st.dataframe(render_report(), hide_index=True, use_container_width=True)
+        st.write("Commodity symbols")
+        st.dataframe(health_report(), hide_index=True, use_container_width=True)